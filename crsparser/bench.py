@@ -0,0 +1,404 @@
+"""
+Benchmarks for crsparser. Run `python bench.py -h` from the root project
+directory for usage.
+
+The "suite" benchmark needs no input files: it generates synthetic catalogs
+of several sizes (see crsparser.synthetic), and measures the parse throughput,
+the peak memory of parsing, and the latency of every kind of filter, both
+per course (filter.filter()) and over the columnar store. Its results can be
+saved as JSON and compared with the results of an earlier run.
+
+The "schedule" benchmark needs no input files either: it times
+schedule.best() on random course lists of several lengths.
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+from crsparser.columnar import ColumnStore
+from crsparser.course import Course, Discussion, Lecture
+import crsparser.export as export
+import crsparser.filter as filter
+from crsparser.parse import Parser
+import crsparser.schedule as schedule
+import crsparser.synthetic as synthetic
+from crsparser.util.memory import deep_sizeof
+from crsparser.util.time import Time, TimeInterval
+
+# Version of the JSON results of the suite benchmark
+SUITE_VERSION = 1
+COURSES_PER_DEPT = 100
+
+# Random course lists of the schedule benchmark
+SCHEDULE_SEEDS = 3              # Course lists timed for each length
+SCHEDULE_LECTURES = (1, 3)      # Range of the number of lectures per course
+SCHEDULE_DISCUSSIONS = (2, 4)   # Range of the number of discussions per lecture
+SCHEDULE_DISCUSSION_ODDS = 0.5  # Odds that a course has discussions
+SCHEDULE_HOURS = (8, 21)        # Hours at which sections may start
+SCHEDULE_DAYS = ["MW", "TR", "M", "T", "W", "R"]
+SCHEDULES_SHOWN = 5
+
+# Metrics compared by compare_results(), and whether higher values are better
+SUITE_METRICS = [("lines_per_sec", True), ("mb_per_sec", True), ("peak_mem_kb", False)]
+
+def catalog_lines(depts):
+    """
+    Returns a list of strings describing every department, course and lecture
+    in depts; two parses give the same result iff their lines are equal.
+    """
+    lines = []
+    for d in depts:
+        lines.append(str(d))
+        for c in d.courses:
+            lines.append(str(c))
+            for lec in c.lec_list:
+                lines.append(str(lec))
+    return lines
+
+def bench_parallel(parser, data_file, max_workers):
+    """
+    Times parser.parse_catalog() with 1, 2, 4, ... up to max_workers processes,
+    checks that every parallel result equals the serial one, and prints the
+    speedup over the serial parser.
+    """
+    print "\nParallel parse ({0})".format(data_file)
+    print "==============\n"
+
+    t = time.time()
+    expected = catalog_lines(parser.parse_catalog(data_file))
+    serial = time.time() - t
+    print "{0:>2} worker(s): {1:8.3f}s".format(1, serial)
+
+    workers = 2
+    while workers <= max_workers:
+        t = time.time()
+        depts = parser.parse_catalog(data_file, workers=workers)
+        elapsed = time.time() - t
+        if catalog_lines(depts) != expected:
+            raise RuntimeError("Parallel result differs from serial result")
+        print "{0:>2} worker(s): {1:8.3f}s  speedup {2:5.2f}x".format(
+            workers, elapsed, serial / elapsed)
+        workers *= 2
+
+def bench_memory(parser, data_file):
+    """
+    Prints the memory used by the parsed catalog, in total and per lecture.
+    Strings and small ints shared with the rest of the program are included.
+    """
+    print "\nMemory ({0})".format(data_file)
+    print "======\n"
+
+    depts = parser.parse_catalog(data_file)
+    n_courses = sum(len(d.courses) for d in depts)
+    n_lecs = sum(len(c.lec_list) for d in depts for c in d.courses)
+
+    gc.collect()
+    size = deep_sizeof(depts, set())
+    print "Courses: {0}, lectures: {1}".format(n_courses, n_lecs)
+    print "Total:       {0:12d} bytes".format(size)
+    if n_lecs > 0:
+        print "Per lecture: {0:12.1f} bytes".format(float(size) / n_lecs)
+
+def bench_export(parser, data_file):
+    """
+    Exports the (already parsed) catalog in every format and prints the number
+    of rows written per second.
+    """
+    print "\nExport ({0})".format(data_file)
+    print "======\n"
+
+    depts = parser.parse_catalog(data_file)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        formats = [
+            ("CSV", lambda depts: export.export_csv(depts, os.path.join(tmp_dir, "csv"))),
+            ("JSON Lines", lambda depts: _export_jsonl_file(
+                depts, os.path.join(tmp_dir, "catalog.jsonl"))),
+            ("SQLite", lambda depts: export.export_sqlite(
+                depts, os.path.join(tmp_dir, "catalog.db")))
+        ]
+        for name, fn in formats:
+            t = time.time()
+            rows = sum(fn(iter(depts)).values())
+            elapsed = time.time() - t
+            print "{0:<10}: {1:9d} rows in {2:8.3f}s ({3:10.0f} rows/s)".format(
+                name, rows, elapsed, rows / elapsed if elapsed > 0 else 0)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+def _export_jsonl_file(depts, filename):
+    """Exports depts to the JSON Lines file filename, closing (and flushing) it."""
+    with open(filename, "w") as out:
+        return export.export_jsonl(depts, out)
+
+def random_courses(n, rnd):
+    """
+    Returns a list of n random Courses, using the Random rnd. Each course has
+    SCHEDULE_LECTURES lectures, and with odds SCHEDULE_DISCUSSION_ODDS each of
+    its lectures has SCHEDULE_DISCUSSIONS discussions. Sections meet for 50
+    minutes starting on the hour, lectures on SCHEDULE_DAYS and discussions
+    on one weekday. The first lecture of every course and its first
+    discussion are planted at hours that no other planted section takes, so
+    the courses always have a conflict-free schedule.
+
+    Raises ValueError if there is no room to plant n courses.
+    """
+    def intv(hour):
+        return TimeInterval(Time.from_minutes(hour * 60), Time.from_minutes(hour * 60 + 50))
+
+    planted = set()             # (day, hour) taken by the planted sections
+    courses = []
+    for i in xrange(n):
+        has_discs = rnd.random() < SCHEDULE_DISCUSSION_ODDS
+        lecs = []
+        for l in xrange(rnd.randint(*SCHEDULE_LECTURES)):
+            for attempt in xrange(1000):
+                days = rnd.choice(SCHEDULE_DAYS)
+                hour = rnd.randint(*SCHEDULE_HOURS)
+                disc_day = rnd.choice("MTWRF")
+                disc_hour = rnd.randint(*SCHEDULE_HOURS)
+                taken = [(d, hour) for d in days]
+                if has_discs:
+                    taken.append((disc_day, disc_hour))
+                if l > 0 or (len(set(taken)) == len(taken) and not planted.intersection(taken)):
+                    break
+            else:
+                raise ValueError("No room to plant {0} courses".format(n))
+            if l == 0:
+                planted.update(taken)
+            discs = []
+            if has_discs:
+                for d in xrange(rnd.randint(*SCHEDULE_DISCUSSIONS)):
+                    if d > 0:
+                        disc_day = rnd.choice("MTWRF")
+                        disc_hour = rnd.randint(*SCHEDULE_HOURS)
+                    discs.append(Discussion("{0}{1}".format(l + 1, chr(ord("A") + d)),
+                                            disc_day, "TA", intv(disc_hour)))
+            lecs.append(Lecture(str(l + 1), days, "PROF", intv(hour), {}, discs))
+        courses.append(Course("COURSE {0}".format(i + 1), str(i + 1), lecs))
+    return courses
+
+def bench_schedule(lengths):
+    """
+    Times schedule.best() on SCHEDULE_SEEDS random course lists (see
+    random_courses()) of each length in lengths, and prints the longest and
+    total times, and the best score found for each list.
+    """
+    print "\nSchedule"
+    print "========\n"
+
+    for n in lengths:
+        times = []
+        scores = []
+        for seed in xrange(SCHEDULE_SEEDS):
+            courses = random_courses(n, random.Random(seed * 1000 + n))
+            t = time.time()
+            top = schedule.best(courses, SCHEDULES_SHOWN)
+            times.append(time.time() - t)
+            scores.append(str(top[0].score) if top else "-")
+        print "{0:>4} courses: max {1:8.3f}s  total {2:8.3f}s  best scores {3}".format(
+            n, max(times), sum(times), " ".join(scores))
+
+def suite_filters():
+    """
+    Returns a list of (name, function) of the filters timed by bench_suite():
+    one of every kind created by crsparser.filter.
+    """
+    return [("duration_eq 50", filter.duration_eq(50)),
+            ("duration_ge 75", filter.duration_ge(75)),
+            ("duration_le 75", filter.duration_le(75)),
+            ("islab", filter.islab()),
+            ("isupperdiv", filter.isupperdiv()),
+            ("occurs_after 12:00", filter.occurs_after(Time("12:00"))),
+            ("occurs_before 12:00", filter.occurs_before(Time("12:00"))),
+            ("occurs_during 9:00-12:00", filter.occurs_during(TimeInterval("9:00", "12:00"))),
+            ("starts_at 9:00", filter.starts_at(Time("9:00"))),
+            ("ends_at 9:50", filter.ends_at(Time("9:50"))),
+            ("query", filter.query("duration >= 75 and not islab or starts_at 9:00"))]
+
+def best_time(fn, repeat):
+    """Returns the shortest of repeat wall times of calling fn(), in seconds."""
+    best = None
+    for _ in xrange(repeat):
+        t = time.time()
+        fn()
+        elapsed = time.time() - t
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def _measure_parse(job):
+    """
+    Parses a catalog and returns a dict of its parse time (best of repeat
+    runs), and the peak memory used by one parse. Run in a new process, so
+    that the peak is not hidden by the memory of earlier benchmarks.
+
+    job - tuple of (dept_file, data_file, repeat)
+    """
+    dept_file, data_file, repeat = job
+    parser = Parser()
+    parser.load_dept_list(dept_file)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    depts = parser.parse_catalog(data_file)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    del depts
+    seconds = best_time(lambda: parser.parse_catalog(data_file), repeat)
+    return {"parse_sec": seconds, "peak_mem_kb": peak}
+
+def bench_suite(sizes, repeat=3, json_file=None, compare_file=None):
+    """
+    Generates a catalog of each size (number of courses) in sizes, and prints
+    and returns the results of parsing and filtering it. The results are also
+    written to json_file, and compared with the results in compare_file, if
+    those are not None.
+    """
+    print "\nSuite"
+    print "=====\n"
+
+    results = {"version": SUITE_VERSION, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": platform.python_version(), "platform": platform.platform(),
+               "repeat": repeat, "sizes": []}
+    tmp_dir = tempfile.mkdtemp()
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        for size in sizes:
+            dept_file = os.path.join(tmp_dir, "depts-{0}.txt".format(size))
+            data_file = os.path.join(tmp_dir, "data-{0}.txt".format(size))
+            n_depts = max(1, size // COURSES_PER_DEPT)
+            counts = synthetic.write_catalog(dept_file, data_file, synthetic.Options(
+                depts=n_depts, courses=size // n_depts))
+            result = {"courses": counts.courses, "lines": counts.lines,
+                      "bytes": os.path.getsize(data_file)}
+            result.update(pool.map(_measure_parse, [(dept_file, data_file, repeat)])[0])
+            result["lines_per_sec"] = result["lines"] / result["parse_sec"]
+            result["mb_per_sec"] = result["bytes"] / 1e6 / result["parse_sec"]
+            print "{courses:>8} courses, {lines:>8} lines: {parse_sec:8.3f}s " \
+                  "({lines_per_sec:9.0f} lines/s, {mb_per_sec:6.2f} MB/s), " \
+                  "peak {peak_mem_kb} KB".format(**result)
+
+            parser = Parser()
+            parser.load_dept_list(dept_file)
+            depts = parser.parse_catalog(data_file)
+            courses = [c for d in depts for c in d.courses]
+            store = ColumnStore(depts)
+            result["filters"] = {}
+            for name, fn in suite_filters():
+                store.mask(fn)          # Builds the time index, if needed
+                result["filters"][name] = {
+                    "filter_ms": best_time(lambda: filter.filter(courses, [fn]), repeat) * 1e3,
+                    "mask_ms": best_time(lambda: store.mask(fn), repeat) * 1e3
+                }
+                print "    {0:<28} filter() {filter_ms:9.3f}ms   mask() {mask_ms:9.3f}ms".format(
+                    name, **result["filters"][name])
+            results["sizes"].append(result)
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(tmp_dir)
+
+    if json_file is not None:
+        with open(json_file, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print "\nResults written to", json_file
+    if compare_file is not None:
+        with open(compare_file) as f:
+            print "\n" + compare_results(json.load(f), results)
+    return results
+
+def compare_results(old, new):
+    """
+    Returns a report comparing two results of bench_suite() for the sizes
+    they have in common, with the ratio new / old of every metric (for times,
+    old / new, so that ratios above 1 are always improvements).
+    """
+    lines = ["Comparison with results of {0} (ratios > 1 are improvements):".format(
+        old.get("time"))]
+    old_sizes = dict((r["courses"], r) for r in old["sizes"])
+    for r in new["sizes"]:
+        o = old_sizes.get(r["courses"])
+        if o is None:
+            continue
+        lines.append("{0:>8} courses".format(r["courses"]))
+        for metric, higher_is_better in SUITE_METRICS:
+            lines.append(_compare_line(metric, o[metric], r[metric], higher_is_better))
+        for name in sorted(r["filters"]):
+            if name in o["filters"]:
+                for metric in ("filter_ms", "mask_ms"):
+                    lines.append(_compare_line(name + " " + metric, o["filters"][name][metric],
+                                               r["filters"][name][metric], False))
+    return "\n".join(lines)
+
+def _compare_line(metric, old, new, higher_is_better):
+    """Returns one line of compare_results()."""
+    if higher_is_better:
+        ratio = float(new) / old if old else float("inf")
+    else:
+        ratio = float(old) / new if new else float("inf")
+    flag = "  REGRESSION" if ratio < 0.9 else ""
+    return "    {0:<40} {1:12.3f} -> {2:12.3f}  x{3:6.2f}{4}".format(
+        metric, old, new, ratio, flag)
+
+# Maps benchmark names to functions taking the parsed command-line arguments
+BENCHMARKS = {
+    "parallel": lambda args, parser: bench_parallel(parser, args.data_file, args.workers),
+    "memory": lambda args, parser: bench_memory(parser, args.data_file),
+    "export": lambda args, parser: bench_export(parser, args.data_file),
+    "suite": lambda args, parser: bench_suite(args.sizes, args.repeat, args.json,
+                                              args.compare),
+    "schedule": lambda args, parser: bench_schedule(args.courses)
+}
+
+# Benchmarks that generate their own catalogs
+SELF_CONTAINED = ["suite", "schedule"]
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark crsparser.")
+    ap.add_argument("dept_file", nargs="?",
+                    help="file with list of departments (not needed for the suite "
+                         "and schedule)")
+    ap.add_argument("data_file", nargs="?",
+                    help="file with catalog data (not needed for the suite and schedule)")
+    ap.add_argument("-w", "--workers", type=int,
+                    default=multiprocessing.cpu_count(),
+                    help="maximum number of parser processes")
+    ap.add_argument("-b", "--bench", action="append", choices=sorted(BENCHMARKS),
+                    help="benchmark to run (may be repeated); default is all, or "
+                         "only the suite and schedule if no files are given")
+    ap.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")],
+                    default=[1000, 10000, 50000],
+                    help="comma-separated numbers of courses of the suite's catalogs "
+                         "(default: 1000,10000,50000)")
+    ap.add_argument("--repeat", type=int, default=3,
+                    help="number of times each suite measurement is repeated")
+    ap.add_argument("--courses", type=lambda s: [int(n) for n in s.split(",")],
+                    default=[10, 15, 20, 25, 30],
+                    help="comma-separated numbers of courses of the schedule benchmark's "
+                         "course lists (default: 10,15,20,25,30)")
+    ap.add_argument("--json", help="file to write the suite's results to")
+    ap.add_argument("--compare", metavar="JSON",
+                    help="results of an earlier suite run to compare with")
+    args = ap.parse_args()
+
+    parser = Parser()
+    if args.data_file is None:
+        names = args.bench or SELF_CONTAINED
+        if any(name not in SELF_CONTAINED for name in names):
+            ap.error("dept_file and data_file are required for " +
+                     ", ".join(name for name in names if name not in SELF_CONTAINED))
+    else:
+        names = args.bench or sorted(BENCHMARKS)
+        parser.load_dept_list(args.dept_file)
+    for name in names:
+        BENCHMARKS[name](args, parser)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+A non-interactive batch mode for crsparser. The catalog is parsed (or loaded
+from its snapshot) once, and then any number of filter expressions (see
+crsparser.query), one per line, are run against it. Results are streamed to
+one output file, or to one file per query.
+"""
+
+import os
+import sys
+
+import crsparser.bitset as bitset
+import crsparser.cache as cache
+from crsparser.columnar import ColumnStore
+from crsparser.parse import Parser
+from crsparser.query import Query
+import crsparser.render as render
+
+# Name of the output file of the i-th query (starting from 1) in an output dir
+QUERY_FILE_FSTR = "query-{0:04d}.txt"
+
+def run(dept_file, data_file, queries, out=sys.stdout, out_dir=None, use_cache=True):
+    """
+    Runs every query in queries against the catalog and returns the number
+    of queries that failed (malformed queries are reported on stderr and
+    skipped). Blank lines and lines starting with "#" are ignored.
+
+    Arguments:
+
+    dept_file - name of file with list of departments
+    data_file - name of file with catalog data
+    queries - iterable of filter expressions, e.g. an open file
+    out - file object the results are written to, if out_dir is None
+    out_dir - directory to write the results of each query to, in a separate
+              file named after QUERY_FILE_FSTR; created if it does not exist
+    use_cache - whether to load the catalog from (and save it to) a snapshot
+    """
+    parser = Parser()
+    parser.load_dept_list(dept_file)
+    if use_cache:
+        depts = cache.load_catalog(parser, data_file)
+    else:
+        depts = parser.parse_catalog(data_file)
+    store = ColumnStore(depts)
+    filter_cache = bitset.FilterCache(store)
+    if out_dir is not None and not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    failed = 0
+    number = 0
+    for line in queries:
+        text = line.strip()
+        if text == "" or text.startswith("#"):
+            continue
+        number += 1
+
+        try:
+            query = Query(text)
+        except ValueError, e:
+            print >> sys.stderr, "ERROR: query {0}: {1}".format(number, e)
+            failed += 1
+            continue
+
+        bits = filter_cache.bits(query)
+        if out_dir is None:
+            write_results(out, store, bits, "{0}: {1}".format(number, text))
+        else:
+            path = os.path.join(out_dir, QUERY_FILE_FSTR.format(number))
+            with open(path, "w") as f:
+                write_results(f, store, bits, text)
+    return failed
+
+def write_results(out, store, bits, title):
+    """
+    Writes the courses of store selected by the bitset bits to the file object
+    out, grouped by department, under the given title.
+    """
+    out.write("### {0} ({1} course(s))\n".format(title, bitset.count(bits)))
+    render.render(out, store, bits)
+    out.write("\n")
@@ -0,0 +1,113 @@
+"""
+Filter results as bitsets, with a cache of the bitset of every filter. A
+bitset is a Python int in which bit i is set iff course i of a ColumnStore is
+selected, so filter results are combined with the int operators & (AND) and
+| (OR), and with invert() (NOT).
+"""
+
+import string
+from collections import OrderedDict
+
+import crsparser.stats as stats
+from crsparser.util.time import Time, TimeInterval
+
+# Translates a course mask (bytes 0 and 1) into a string of binary digits
+_MASK_TO_DIGITS = string.maketrans("\x00\x01", "01")
+_DIGITS_TO_MASK = string.maketrans("01", "\x00\x01")
+
+def from_mask(mask):
+    """Returns the bitset of a course mask (see crsparser.columnar)."""
+    if len(mask) == 0:
+        return 0
+    return int(str(mask[::-1]).translate(_MASK_TO_DIGITS), 2)
+
+def to_mask(bits, n):
+    """Returns the course mask of n courses selected by the bitset bits."""
+    digits = bin(bits)[:1:-1]       # Least significant bit first, without "0b"
+    mask = bytearray(digits[:n].translate(_DIGITS_TO_MASK))
+    mask.extend(bytearray(n - len(mask)))
+    return mask
+
+def full(n):
+    """Returns the bitset selecting all n courses."""
+    return (1 << n) - 1
+
+def invert(bits, n):
+    """Returns the bitset selecting exactly the courses (of n) not in bits."""
+    return ~bits & full(n)
+
+def count(bits):
+    """Returns the number of courses selected by bits."""
+    return bin(bits).count("1")
+
+def filter_key(fn):
+    """
+    Returns a hashable key identifying the filter fn: (name, argument) for
+    functions from crsparser.filter, and fn itself for any other function.
+    """
+    name = getattr(fn, "filter_name", None)
+    if name is None:
+        return fn
+    arg = fn.filter_arg
+    if isinstance(arg, Time):
+        arg = arg.minutes()
+    elif isinstance(arg, TimeInterval):
+        arg = (arg.start.minutes(), arg.end.minutes())
+    return (name, arg)
+
+class FilterCache(object):
+    """
+    A least-recently-used cache of the bitsets of filters over one ColumnStore.
+    Two filters created with the same function and argument share one entry.
+    Filters with a bits(cache) method, such as query.Query, are evaluated from
+    the cached bitsets of their parts.
+    """
+    def __init__(self, store, maxsize=128):
+        """
+        Arguments:
+
+        store - ColumnStore the filters are evaluated over
+        maxsize - maximum number of bitsets to keep
+        """
+        self.store = store
+        self.maxsize = maxsize
+        self._bits = OrderedDict()
+
+    def bits(self, fn):
+        """Returns the bitset of the courses selected by the filter fn."""
+        key = filter_key(fn)
+        bits = self._bits.pop(key, None)
+        if bits is not None:
+            stats.incr("filter_cache.hits")
+        else:
+            stats.incr("filter_cache.misses")
+            if hasattr(fn, "bits"):
+                bits = fn.bits(self)
+            else:
+                bits = from_mask(self.store.mask(fn))
+            if len(self._bits) >= self.maxsize:
+                self._bits.popitem(last=False)
+        self._bits[key] = bits      # (Re)insert as the most recently used
+        return bits
+
+    def all_of(self, fn_list):
+        """Returns the bitset of the courses selected by every filter in fn_list."""
+        bits = full(len(self.store))
+        for fn in fn_list:
+            bits &= self.bits(fn)
+        return bits
+
+    def any_of(self, fn_list):
+        """Returns the bitset of the courses selected by any filter in fn_list."""
+        bits = 0
+        for fn in fn_list:
+            bits |= self.bits(fn)
+        return bits
+
+    def none_of(self, fn_list):
+        """Returns the bitset of the courses selected by no filter in fn_list."""
+        return invert(self.any_of(fn_list), len(self.store))
+
+    def clear(self):
+        """Removes all cached bitsets."""
+        self._bits.clear()
@@ -0,0 +1,156 @@
+"""
+Persistent snapshots of parsed catalogs, so that an unchanged catalog file does
+not have to be parsed again. A snapshot stores the list of Departments returned
+by Parser.parse_catalog() as nested tuples in marshal's binary format (which
+loads much faster than pickled objects), preceded by a header that identifies
+the catalog file and the department list it was parsed with.
+"""
+
+import gc
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+from crsparser.course import Department, Course, Lecture, Discussion
+import crsparser.stats as stats
+from crsparser.util.time import Time, TimeInterval
+
+# First item of every snapshot header; bump when the snapshot layout or the
+# parser's output changes.
+SNAPSHOT_MAGIC = "crsparser-snapshot-4"
+SNAPSHOT_EXT = ".snapshot"
+SNAPSHOT_MODE = 0644            # Permissions of written snapshots
+
+def load_catalog(parser, data_file, snapshot_file=None):
+    """
+    Returns the list of Departments in data_file, loading them from the
+    snapshot if it is up to date and parsing the catalog (and rewriting the
+    snapshot) otherwise. Stale or corrupt snapshots are rebuilt silently, and
+    a snapshot that cannot be written (e.g. in a read-only directory) is
+    skipped, so the parsed catalog is still returned.
+
+    Arguments:
+
+    parser - Parser with the department list of the catalog
+    data_file - name of file with catalog data
+    snapshot_file - name of the snapshot; defaults to data_file + SNAPSHOT_EXT
+    """
+    if snapshot_file is None:
+        snapshot_file = data_file + SNAPSHOT_EXT
+
+    with stats.timer("snapshot.read"):
+        depts = read_snapshot(snapshot_file, data_file, parser.dept_list)
+    if depts is None:
+        stats.incr("snapshot.misses")
+        depts = parser.parse_catalog(data_file)
+        with stats.timer("snapshot.write"):
+            try:
+                write_snapshot(snapshot_file, data_file, depts, parser.dept_list)
+            except (IOError, OSError):
+                stats.incr("snapshot.write_errors")
+    return depts
+
+def read_snapshot(snapshot_file, data_file, dept_list):
+    """
+    Returns the Departments stored in snapshot_file if it was made from the
+    current contents of data_file and the department list dept_list, and
+    None if the snapshot is missing, stale or unreadable.
+    """
+    # The decoded graph is all new objects, none of them garbage, so pausing
+    # the cyclic collector while loading avoids many pointless collections.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(snapshot_file, "rb") as f:
+            header = marshal.load(f)
+            if not _is_fresh(header, data_file, dept_list):
+                return None
+            return [_decode_dept(d) for d in marshal.load(f)]
+    except Exception:           # Corrupt snapshots can raise almost anything
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def write_snapshot(snapshot_file, data_file, depts, dept_list):
+    """
+    Writes depts to snapshot_file, tagged with the current state of data_file
+    and the department list dept_list that depts were parsed with. The
+    snapshot is written to a new temporary file in the same directory first,
+    so readers never see a partially written snapshot, and processes writing
+    the same snapshot at once do not write the same file. The temporary file
+    is removed if writing fails.
+    """
+    st = os.stat(data_file)
+    header = (SNAPSHOT_MAGIC, sys.version_info[:2], st.st_size, st.st_mtime,
+              file_hash(data_file), list(dept_list))
+
+    fd, tmp_file = tempfile.mkstemp(suffix=".tmp",
+                                    dir=os.path.dirname(snapshot_file) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(header, f)
+            marshal.dump([_encode_dept(d) for d in depts], f)
+        os.chmod(tmp_file, SNAPSHOT_MODE)   # mkstemp() makes it private to the owner
+        if os.name == "nt" and os.path.exists(snapshot_file):
+            os.remove(snapshot_file)    # Windows cannot rename over a file
+        os.rename(tmp_file, snapshot_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+def file_hash(filename):
+    """Returns the SHA-1 hex digest of the contents of the given file."""
+    h = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), ""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _is_fresh(header, data_file, dept_list):
+    """
+    Returns true if the snapshot header matches data_file and the department
+    list dept_list. The file is only hashed if its size or mtime differs.
+    """
+    magic, version, size, mtime, digest, header_depts = header
+    if (magic != SNAPSHOT_MAGIC or version != sys.version_info[:2] or
+            header_depts != list(dept_list)):
+        return False
+
+    st = os.stat(data_file)
+    if st.st_size != size:
+        return False
+    return st.st_mtime == mtime or file_hash(data_file) == digest
+
+# Encoding of the Department/Course/Lecture/Discussion graph as nested tuples
+# of marshallable values; times are stored as minutes since midnight.
+
+def _encode_intv(intv):
+    return (intv.start.minutes(), intv.end.minutes(), intv.align)
+
+def _decode_intv(t):
+    return TimeInterval(Time.from_minutes(t[0]), Time.from_minutes(t[1]), t[2])
+
+def _encode_dept(dept):
+    return (dept.name, [(c.name, c.number, [_encode_lec(lec) for lec in c.lec_list])
+                        for c in dept.courses])
+
+def _decode_dept(t):
+    name, courses = t
+    return Department(name, [Course(cname, number, [_decode_lec(lec) for lec in lecs])
+                             for cname, number, lecs in courses])
+
+def _encode_lec(lec):
+    discs = [(disc.name, disc.day, disc.ta_name, _encode_intv(disc.time_intv))
+             for disc in lec.disc_list]
+    return (lec.number, lec.days, lec.prof_name, _encode_intv(lec.time_intv),
+            dict(lec.info_dict), discs)
+
+def _decode_lec(t):
+    number, days, prof_name, intv, info_dict, discs = t
+    disc_list = [Discussion(name, day, ta_name, _decode_intv(dintv))
+                 for name, day, ta_name, dintv in discs]
+    return Lecture(number, days, prof_name, _decode_intv(intv), info_dict, disc_list)
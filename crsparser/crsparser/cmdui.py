@@ -4,9 +4,17 @@ A command-line interface for crsparser.
 Copyright (C) 2014 by Michael Wang
 """
 
+import sys
+
+import crsparser.bitset as bitset
+import crsparser.cache as cache
+from crsparser.columnar import ColumnStore
 import crsparser.filter as filter
+from crsparser.numindex import NumberIndex
 from crsparser.parse import Parser
-from crsparser.util.time import Time
+import crsparser.render as render
+import crsparser.schedule as schedule
+from crsparser.util.time import Time, TimeInterval
 import crsparser.util.utils as utils
 
 # Constants
@@ -20,11 +28,19 @@ FILTER_NAMES = ["Duration equals",
                 "Starts at exactly",
                 "Ends at exactly",
                 "Is upper division (>=100)",
-                "Is a lab (\"L\" suffix)"]
+                "Is a lab (\"L\" suffix)",
+                "Occurs during",
+                "Filter expression (e.g. \"duration >= 50 and not islab\")"]
+PAGE_SIZE = 50          # Number of courses shown per page of results
+SCHEDULES_SHOWN = 5     # Number of best schedules shown
 
 # Global module variables
 _depts = []             # List of Departments
+_store = None           # ColumnStore of _depts
+_cache = None           # FilterCache of the filters' bitsets over _store
+_index = None           # NumberIndex of _depts
 _filters = []           # List of functions to pass to filter.filter()
+_selection = None       # Bitset of courses selected by _filters (None if unknown)
 _filter_names = []      # List of filter descriptions (strings)
 _status = ""            # Status of program
 
@@ -42,7 +58,8 @@ def run():
         print "========="
         print "\n1. Parse data"
         print "2. Filter & display data"
-        print "3. Quit"
+        print "3. Build schedules"
+        print "4. Quit"
         print "\n{0}: {1}".format("STATUS", _status)
         print "\nChoose an option:",
 
@@ -53,6 +70,8 @@ def run():
         elif option == "2":
             filter_data()
         elif option == "3":
+            build_schedules()
+        elif option == "4":
             print "\nGoodbye!"
             break
         else:
@@ -83,9 +102,14 @@ def parse_data():
     print "\nParsing data..."
 
     try:
-        Parser.load_dept_list(dept_file)
-        global _depts
-        _depts = Parser.parse_catalog(data_file)
+        parser = Parser()
+        parser.load_dept_list(dept_file)
+        global _depts, _store, _cache, _index, _selection
+        _depts = cache.load_catalog(parser, data_file)
+        _store = ColumnStore(_depts)
+        _cache = bitset.FilterCache(_store)
+        _index = NumberIndex(_depts)
+        _selection = None
     except IOError, e:
         print "ERROR:", e
         print "\nPress <Enter> to continue..."
@@ -129,7 +153,7 @@ def filter_data():
             continue
 
 def _add_filter():
-    global _filters, _filter_names
+    global _filters, _filter_names, _selection
 
     while True:
         print "\nAdd a filter:"
@@ -191,34 +215,127 @@ def _add_filter():
         elif option == 9:
             fn = filter.islab()
             name = FILTER_NAMES[option - 1]
+        elif option == 10:                      # Two times, e.g. "9:00" and "11:00"
+            print "Enter a start time:",
+            start = raw_input()
+            print "Enter an end time:",
+            end = raw_input()
+
+            if not utils.istime(start) or not utils.istime(end):
+                print "Error: invalid time"
+                continue
+            else:
+                fn = filter.occurs_during(TimeInterval(start, end))
+                name = FILTER_NAMES[option - 1] + ": " + start + "-" + end
+        elif option == 11:
+            print "Enter an expression:",
+            expr = raw_input()
+
+            try:
+                fn = filter.query(expr)
+            except ValueError, e:       # Includes query.QueryError
+                print "Error:", e
+                continue
+            name = str(fn)
         else:
             print "Error: invalid option"
             continue
 
         _filters.append(fn)
+        if _selection is not None:      # Narrow down the previous result
+            _selection &= _cache.bits(fn)
         _filter_names.append(name)
 
+def build_schedules():
+    """
+    Prompts the user for a list of courses and constraints, and displays the
+    best conflict-free schedules of the courses.
+    """
+    if _status == STATUS_UNLOADED:
+        print "ERROR: no data loaded"
+        print "\nPress <Enter> to continue..."
+        raw_input()
+        return
+
+    print "\nBuilding schedules"
+    print "==================\n"
+    courses = []
+    while True:
+        print "Department (empty to finish):",
+        dept = raw_input().strip().upper()
+        if dept == "":
+            break
+        print "Course number:",
+        number = raw_input().strip()
+
+        found = _index.find(number, dept)
+        if not found:
+            print "Error: no such course"
+            continue
+        courses.append(found[0][1])
+        print "Added", found[0][1]
+    if not courses:
+        return
+
+    print "\nNo classes before (time, or empty for any):",
+    earliest = raw_input().strip()
+    print "No classes after (time, or empty for any):",
+    latest = raw_input().strip()
+    print "Maximum gap between classes in minutes (empty for any):",
+    max_gap = raw_input().strip()
+    print "Preferred days, e.g. MWF (empty for any):",
+    days = raw_input().strip().upper()
+
+    if (earliest and not utils.istime(earliest)) or (latest and not utils.istime(latest)):
+        print "Error: invalid time"
+        return
+    if max_gap and not max_gap.isdigit():
+        print "Error: invalid number of minutes"
+        return
+    constraints = schedule.Constraints(
+        earliest=Time(earliest) if earliest else None,
+        latest=Time(latest) if latest else None,
+        max_gap=int(max_gap) if max_gap else None,
+        preferred_days=days or None)
+
+    results = schedule.best(courses, SCHEDULES_SHOWN, constraints)
+    if not results:
+        print "\nNo conflict-free schedule found"
+    for i, s in enumerate(results):
+        print "\n#{0}: {1}".format(i + 1, s)
+
 def _display_results():
-    for d in _depts:
-        print "\n-----", str(d), "-----"
-        # If no filters, print out everything
-        if len(_filters) == 0:
-            for c in d.courses:
-                print str(c)
-                for lec in c.lec_list:
-                    print "   " + str(lec)
-        # If filters set, filter d.courses
-        else:
-            selected = filter.filter(d.courses, _filters)
-            for i in xrange(len(d.courses)):
-                if selected[i]:
-                    print str(d.courses[i])
-                    for lec in d.courses[i].lec_list:
-                        print "   " + str(lec)
+    global _selection
+    bits = None                 # Every course, if no filters are set
+    if len(_filters) > 0:
+        if _selection is None:
+            _selection = _cache.all_of(_filters)
+        bits = _selection
+    total = render.count(_store, bits)
+
+    print "\n{0} course(s) found".format(total)
+    print "Display (a)ll, one (p)age at a time, or (c)ount only? (a/p/c)",
+
+    option = raw_input().lower()
+
+    if option.startswith("c"):
+        return
+    elif option.startswith("p"):
+        shown = 0
+        while shown < total:
+            shown += render.render(sys.stdout, _store, bits, shown, PAGE_SIZE)
+            if shown < total:
+                print "\n-- {0} of {1} course(s) shown; <Enter> for more, q to stop --".format(
+                    shown, total),
+                if raw_input().lower().startswith("q"):
+                    break
+    else:
+        render.render(sys.stdout, _store, bits)
 
 def _reset_filters():
-    global _filters, _filter_names, _status
+    global _filters, _filter_names, _selection, _status
     _filters = []
+    _selection = None           # Cached bitsets of single filters are kept
     _filter_names = []
     _status = STATUS_LOADED.format(0)
     print "\n---FILTERS RESET---"
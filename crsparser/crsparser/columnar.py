@@ -0,0 +1,292 @@
+"""
+A columnar copy of a parsed catalog, for filtering the whole catalog at once.
+A ColumnStore is built once after parsing and holds one array per field, with
+one entry per course or per lecture. The filter functions created by
+crsparser.filter are recognized by their tags and evaluated over those arrays
+into a mask (a bytearray with one 0/1 entry per course) without calling any
+Course methods; other functions f: Course -> bool are called once per course.
+Time filters are answered from a TimeIndex, which is built on the first time
+query and reused afterwards. Lectures and discussions can also be queried
+together, one row per section, in a SectionTable.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import izip
+
+import crsparser.stats as stats
+
+# Bit of each day letter in a day mask, e.g. "MW" -> 1 | 4
+DAY_BITS = {"M": 1, "T": 2, "W": 4, "R": 8, "F": 16, "S": 32, "U": 64}
+
+def day_mask(days):
+    """Returns the day mask of a string of day letters such as "MWF"."""
+    mask = 0
+    for c in days or "":
+        mask |= DAY_BITS.get(c, 0)
+    return mask
+
+class ColumnStore(object):
+    """
+    The courses of a list of Departments, stored column by column. Courses are
+    numbered in catalog order; the courses of department i are the courses
+    dept_offsets[i] up to (excluding) dept_offsets[i+1], and the lectures of
+    course j are the lectures lec_offsets[j] up to lec_offsets[j+1]. Missing
+    or non-numeric values are stored as -1.
+    """
+    def __init__(self, depts):
+        """
+        Arguments:
+
+        depts - list of Departments, e.g. from Parser.parse_catalog()
+        """
+        self.depts = depts
+        self.courses = []                   # Course objects, in course order
+
+        # Per department
+        self.dept_offsets = array("l", [0])
+
+        # Per course
+        self.course_num = array("l")        # Numeric part of the course number
+        self.course_lab = array("b")        # 1 if the course is a lab
+        self.course_duration = array("l")   # Duration of the first lecture
+        self.lec_offsets = array("l", [0])
+
+        # Per lecture
+        self.lec_course = array("l")        # Index of the lecture's course
+        self.lec_start = array("l")         # Start time in minutes since midnight
+        self.lec_end = array("l")           # End time in minutes since midnight
+        self.lec_duration = array("l")      # Duration in minutes
+        self.lec_days = array("b")          # Day mask, see day_mask()
+        self.lec_capacity = array("l")
+        self.lec_units = array("l")
+
+        for d in depts:
+            for c in d.courses:
+                self._add_course(c)
+            self.dept_offsets.append(len(self.courses))
+
+        self._time_index = None
+        self._sections = None
+
+    @property
+    def time_index(self):
+        """The TimeIndex of the lectures, built on first access."""
+        if self._time_index is None:
+            self._time_index = TimeIndex(self)
+        return self._time_index
+
+    @property
+    def sections(self):
+        """The SectionTable of the catalog, built on first access."""
+        if self._sections is None:
+            self._sections = SectionTable(self)
+        return self._sections
+
+    def _add_course(self, crs):
+        """Appends the fields of crs and its lectures to the columns."""
+        ci = len(self.courses)
+        self.courses.append(crs)
+        self.course_num.append(-1 if crs.num is None else crs.num)
+        self.course_lab.append(1 if crs.islab() else 0)
+
+        for lec in crs.lec_list:
+            intv = lec.time_intv
+            self.lec_course.append(ci)
+            self.lec_start.append(intv.start.minutes())
+            self.lec_end.append(intv.end.minutes())
+            self.lec_duration.append(intv.duration())
+            self.lec_days.append(day_mask(lec.days))
+            self.lec_capacity.append(_intcol(lec.capacity))
+            self.lec_units.append(_intcol(lec.units))
+
+        first = self.lec_offsets[-1]
+        self.lec_offsets.append(len(self.lec_course))
+        self.course_duration.append(self.lec_duration[first] if crs.lec_list else -1)
+
+    def __len__(self):
+        """Returns the number of courses."""
+        return len(self.courses)
+
+    def mask(self, fn):
+        """
+        Returns a bytearray with one entry per course, 1 if fn(course) is true
+        and 0 otherwise.
+        """
+        name = getattr(fn, "filter_name", None)
+        evaluate = _EVALUATORS.get(name)
+        with stats.timer("mask." + (name or "function")):
+            if evaluate is None:
+                return bytearray(1 if fn(c) else 0 for c in self.courses)
+            return evaluate(self, fn.filter_arg)
+
+    def filter(self, fn_list):
+        """
+        Returns the mask of the courses that meet every criterion in fn_list
+        (a list of functions f: Course -> bool, as for filter.filter()).
+        """
+        result = bytearray([1]) * len(self.courses)
+        for fn in fn_list:
+            result = bytearray(a & b for a, b in izip(result, self.mask(fn)))
+        return result
+
+    def dept_selection(self, mask, i):
+        """
+        Returns the part of mask for department i as a list of booleans, in
+        the same form as filter.filter() returns for that department.
+        """
+        return [m == 1 for m in mask[self.dept_offsets[i]:self.dept_offsets[i+1]]]
+
+    def lecs_mask(self, lecs):
+        """
+        Returns the course mask of the courses of the given lectures (an
+        iterable of lecture indices).
+        """
+        result = bytearray(len(self.courses))
+        lec_course = self.lec_course
+        for li in lecs:
+            result[lec_course[li]] = 1
+        return result
+
+class TimeIndex(object):
+    """
+    The lectures of a ColumnStore sorted by start time and by end time, so
+    that the lectures starting or ending in a range of times are found by
+    binary search. starts[k] is the start time of lecture by_start[k], and
+    ends[k] is the end time of lecture by_end[k].
+    """
+    def __init__(self, store):
+        self.store = store
+        n = len(store.lec_start)
+        self.by_start = array("l", sorted(xrange(n), key=store.lec_start.__getitem__))
+        self.starts = array("l", (store.lec_start[li] for li in self.by_start))
+        self.by_end = array("l", sorted(xrange(n), key=store.lec_end.__getitem__))
+        self.ends = array("l", (store.lec_end[li] for li in self.by_end))
+
+    def starting_between(self, lo, hi):
+        """Returns the lectures (as indices) starting at lo to hi minutes, inclusive."""
+        return self.by_start[bisect_left(self.starts, lo):bisect_right(self.starts, hi)]
+
+    def ending_between(self, lo, hi):
+        """Returns the lectures (as indices) ending at lo to hi minutes, inclusive."""
+        return self.by_end[bisect_left(self.ends, lo):bisect_right(self.ends, hi)]
+
+    def within(self, lo, hi):
+        """
+        Returns the lectures (as indices) that start at or after lo minutes and
+        end at or before hi minutes.
+        """
+        lec_end = self.store.lec_end
+        return [li for li in self.starting_between(lo, hi) if lec_end[li] <= hi]
+
+class SectionTable(object):
+    """
+    Every lecture and discussion of a ColumnStore, one row per section. The
+    rows of each lecture are the lecture itself followed by its discussions,
+    in catalog order. Courses and lectures are identified by their indices in
+    the ColumnStore, so results can be turned into course masks. Missing or
+    non-numeric values are stored as -1.
+    """
+    LECTURE = 0
+    DISCUSSION = 1
+
+    def __init__(self, store):
+        self.store = store
+        self.sections = []                  # Lecture and Discussion objects
+        self.sec_kind = array("b")          # LECTURE or DISCUSSION
+        self.sec_course = array("l")        # Index of the section's course
+        self.sec_lecture = array("l")       # Index of the section's lecture
+        self.sec_days = array("b")          # Day mask, see day_mask()
+        self.sec_start = array("l")         # Start time in minutes since midnight
+        self.sec_end = array("l")           # End time in minutes since midnight
+        self.sec_capacity = array("l")      # Capacity of lectures, -1 for discussions
+
+        li = 0
+        for ci, crs in enumerate(store.courses):
+            for lec in crs.lec_list:
+                self._add(lec, SectionTable.LECTURE, ci, li, lec.days,
+                          _intcol(lec.capacity))
+                for disc in lec.disc_list:
+                    self._add(disc, SectionTable.DISCUSSION, ci, li, disc.day, -1)
+                li += 1
+
+    def _add(self, sec, kind, ci, li, days, capacity):
+        intv = sec.time_intv
+        self.sections.append(sec)
+        self.sec_kind.append(kind)
+        self.sec_course.append(ci)
+        self.sec_lecture.append(li)
+        self.sec_days.append(day_mask(days))
+        self.sec_start.append(intv.start.minutes())
+        self.sec_end.append(intv.end.minutes())
+        self.sec_capacity.append(capacity)
+
+    def __len__(self):
+        """Returns the number of sections."""
+        return len(self.sections)
+
+    def select(self, kind=None, days=None, after=None, before=None):
+        """
+        Returns the list of the indices of the sections that meet every given
+        criterion, in a single scan of the table, e.g. all discussions on
+        Fridays from 2pm on:
+
+            table.select(SectionTable.DISCUSSION, "F", after=Time("2:00p"))
+
+        Arguments (all optional):
+
+        kind - SectionTable.LECTURE or SectionTable.DISCUSSION
+        days - string of days, e.g. "MW"; sections must meet on at least one
+        after - Time at or after which sections must start
+        before - Time at or before which sections must end
+        """
+        kind = -1 if kind is None else kind
+        days = 0 if days is None else day_mask(days)
+        lo = -1 if after is None else after.minutes()
+        hi = _MAX_MINS if before is None else before.minutes()
+        rows = izip(self.sec_kind, self.sec_days, self.sec_start, self.sec_end)
+        return [i for i, (k, d, start, end) in enumerate(rows)
+                if (kind < 0 or k == kind) and (not days or d & days) and
+                start >= lo and end <= hi]
+
+    def course_mask(self, secs):
+        """
+        Returns the course mask of the courses of the given sections (an
+        iterable of section indices).
+        """
+        result = bytearray(len(self.store.courses))
+        sec_course = self.sec_course
+        for i in secs:
+            result[sec_course[i]] = 1
+        return result
+
+def _intcol(n):
+    """Returns n if it is an int, and -1 (a missing value) otherwise."""
+    return n if isinstance(n, (int, long)) else -1
+
+_MAX_MINS = 24 * 60
+
+# Evaluators of the filters in crsparser.filter, keyed by filter name. Each
+# takes the ColumnStore and the filter's argument and returns a course mask.
+_EVALUATORS = {
+    "duration_eq": lambda cs, n:
+        bytearray(1 if d >= 0 and d == n else 0 for d in cs.course_duration),
+    "duration_ge": lambda cs, n:
+        bytearray(1 if d >= 0 and d >= n else 0 for d in cs.course_duration),
+    "duration_le": lambda cs, n:
+        bytearray(1 if d >= 0 and d <= n else 0 for d in cs.course_duration),
+    "islab": lambda cs, arg: bytearray(cs.course_lab),
+    "isupperdiv": lambda cs, arg:
+        bytearray(1 if n >= 100 else 0 for n in cs.course_num),
+    "occurs_after": lambda cs, t:
+        cs.lecs_mask(cs.time_index.starting_between(t.minutes(), _MAX_MINS)),
+    "occurs_before": lambda cs, t:
+        cs.lecs_mask(cs.time_index.ending_between(-1, t.minutes())),
+    "occurs_during": lambda cs, intv:
+        cs.lecs_mask(cs.time_index.within(intv.start.minutes(), intv.end.minutes())),
+    "starts_at": lambda cs, t:
+        cs.lecs_mask(cs.time_index.starting_between(t.minutes(), t.minutes())),
+    "ends_at": lambda cs, t:
+        cs.lecs_mask(cs.time_index.ending_between(t.minutes(), t.minutes())),
+    "query": lambda cs, q: q.mask(cs)
+}
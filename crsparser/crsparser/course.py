@@ -1,7 +1,12 @@
+import re
+from collections import MutableMapping
+
 import crsparser.util.utils as utils
 
 class Department(object):
     """A department with a name and a list of courses."""
+    __slots__ = ("name", "courses")
+
     def __init__(self, name, courses):
         """
         Arguments:
@@ -21,6 +26,12 @@ class Course(object):
     A course in the course catalog, consisting of multiple lectures. Contains
     information about: course name and number; lectures.
     """
+    # Group 1 = prefix letters, group 2 = numeric part, group 3 = suffix
+    NUMBER_REGEX = re.compile(r"([A-Za-z]*)([0-9]*)(.*)$")
+
+    # num, prefix and suffix are computed from number, see split_number()
+    __slots__ = ("name", "_number", "lec_list", "num", "prefix", "suffix")
+
     def __init__(self, name, number, lec_list):
         """
         Arguments:
@@ -33,6 +44,19 @@ class Course(object):
         self.number = number
         self.lec_list = lec_list
 
+    @property
+    def number(self):
+        """
+        The catalog number, e.g. "35L". Setting it also sets prefix, num and
+        suffix from it (see split_number()).
+        """
+        return self._number
+
+    @number.setter
+    def number(self, number):
+        self._number = number
+        self.prefix, self.num, self.suffix = split_number(number)
+
     def __str__(self):
         """Returns the course name appended with a space to its number."""
         return self.number + " " + self.name
@@ -49,14 +73,14 @@ class Course(object):
         Returns true if this course is a lab (has an "L" in its number), and
         false if otherwise.
         """
-        return "l" in self.number.lower()
+        return "L" in self.suffix or "L" in self.prefix
 
     def isupperdiv(self):
         """
         Returns true if this course is an upper division course, and false
         if otherwise.
         """
-        return utils.stoi(self.number) >= 100
+        return self.num is not None and self.num >= 100
 
     def occurs_after(self, time):
         """
@@ -78,6 +102,18 @@ class Course(object):
                 return True
         return False
 
+    def occurs_during(self, time_intv):
+        """
+        Returns true if this course contains a lecture that starts at or after
+        the start of time_intv (a TimeInterval) and ends at or before its end,
+        and false if otherwise.
+        """
+        for lec in self.lec_list:
+            if (lec.time_intv.start >= time_intv.start and
+                    lec.time_intv.end <= time_intv.end):
+                return True
+        return False
+
     def starts_at(self, time):
         """
         Returns true if this course contains a lecture that begins at the
@@ -115,6 +151,10 @@ class Lecture(object):
     # 4 = capacity
     LEC_FSTR = "LEC {0} [{1:<3}] {2} | {3} | EnCp: {4}"
 
+    # The entries of info_dict are stored in slots of the same name; numeric
+    # entries are stored as ints, and repeated strings are interned.
+    __slots__ = ["number", "days", "prof_name", "time_intv", "disc_list"] + INFO_KEYS
+
     def __init__(self, number, days, prof_name, time_intv, info_dict, disc_list):
         """
         Arguments:
@@ -127,19 +167,67 @@ class Lecture(object):
         disc_list - list of Discussions
         """
         self.number = number
-        self.days = days
-        self.prof_name = prof_name
+        self.days = _intern(days)
+        self.prof_name = _intern(prof_name)
         self.time_intv = time_intv
         self.info_dict = info_dict
         self.disc_list = disc_list
 
+    @property
+    def info_dict(self):
+        """
+        A dict-like view of the lecture's info, with keys from
+        Lecture.INFO_KEYS. Setting an entry (e.g. info_dict["capacity"] = 5,
+        or update()) sets the slot of the same name, converting it as when
+        the info is assigned; use dict(info_dict) for an independent copy.
+        """
+        return _InfoView(self)
+
+    @info_dict.setter
+    def info_dict(self, info_dict):
+        for k in Lecture.INFO_KEYS:
+            setattr(self, k, _INFO_CONVERT[k](info_dict.get(k)))
+
     def __str__(self):
         """
         Returns a string representing this lecture (does not include
         discussion information). Every item is aligned until the first pipe.
         """
         return Lecture.LEC_FSTR.format(self.number, self.days, str(self.time_intv),
-                                       self.prof_name, self.info_dict["capacity"])
+                                       self.prof_name, self.capacity)
+
+class _InfoView(MutableMapping):
+    """
+    The info of a Lecture as a mapping, returned by Lecture.info_dict. Every
+    key of Lecture.INFO_KEYS is always present; deleting an entry sets it to
+    None.
+    """
+    __slots__ = ("_lec",)
+
+    def __init__(self, lec):
+        self._lec = lec
+
+    def __getitem__(self, key):
+        if key not in _INFO_CONVERT:
+            raise KeyError(key)
+        return getattr(self._lec, key)
+
+    def __setitem__(self, key, value):
+        if key not in _INFO_CONVERT:
+            raise KeyError(key)
+        setattr(self._lec, key, _INFO_CONVERT[key](value))
+
+    def __delitem__(self, key):
+        self[key] = None
+
+    def __iter__(self):
+        return iter(Lecture.INFO_KEYS)
+
+    def __len__(self):
+        return len(Lecture.INFO_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 class Discussion(object):
     """
@@ -149,6 +237,8 @@ class Discussion(object):
     # 0 = name (align left), 1 = days, 2 = time_interval, 3 = ta_name
     DISC_FSTR = "DIS {0:<2s} [{1}] {2} | {3}"
 
+    __slots__ = ("name", "day", "ta_name", "time_intv")
+
     def __init__(self, name, day, ta_name, time_intv):
         """
         Arguments:
@@ -159,8 +249,8 @@ class Discussion(object):
         time_intv - TimeInterval representing discussion hours
         """
         self.name = name
-        self.day = day
-        self.ta_name = ta_name
+        self.day = _intern(day)
+        self.ta_name = _intern(ta_name)
         self.time_intv = time_intv
 
     def __str__(self):
@@ -170,3 +260,36 @@ class Discussion(object):
         """
         return Discussion.DISC_FSTR.format(self.name, self.day,
                                            str(self.time_intv), self.ta_name)
+
+def split_number(number):
+    """
+    Splits a catalog number into (prefix, numeric part, suffix), e.g. "M51A"
+    into ("M", 51, "A") and "35L" into ("", 35, "L"). The letters are converted
+    to uppercase, and the numeric part is None if the number has no digits.
+    """
+    fields = _NUMBERS.get(number)
+    if fields is None:
+        r = Course.NUMBER_REGEX.match(number)
+        digits = r.group(2)
+        fields = (_intern(r.group(1).upper()), int(digits) if digits else None,
+                  _intern(r.group(3).upper()))
+        if len(_NUMBERS) < _MAX_NUMBERS:
+            _NUMBERS[number] = fields
+    return fields
+
+# Fields of catalog numbers that were split before, up to _MAX_NUMBERS numbers
+_NUMBERS = {}
+_MAX_NUMBERS = 100000
+
+def _intern(s):
+    """Returns the interned version of the string s, or s if it is not a str."""
+    return intern(s) if isinstance(s, str) else s
+
+def _toint(s):
+    """Returns int(s) if s can be casted to an int, and s otherwise."""
+    return int(s) if s is not None and utils.isint(s) else s
+
+# Conversion of each entry of Lecture.info_dict before it is stored in its slot
+_INFO_CONVERT = {"loc": _intern, "capacity": _toint, "xc": _toint,
+                 "grade_type": _intern, "units": _toint,
+                 "same_as": lambda s: s, "restrict": lambda s: s}
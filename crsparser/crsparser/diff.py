@@ -0,0 +1,193 @@
+"""
+Differences between the catalogs of two terms. Courses are matched by
+department and normalized course number (see course.split_number(), so "35l"
+and "35L" are the same course), and sections by their number within the
+course (e.g. "1" for a lecture, "1A" for a discussion). The old catalog is
+indexed once in dicts, and the new catalog is streamed past the index, so the
+diff takes time linear in the size of both catalogs.
+
+The diff is a stream of (table name, row) tuples, with the tables described
+by TABLES, so it is written with the writers of crsparser.export, e.g.
+
+    export.write_csv(diff.iter_diff(old, new), diff.TABLES, "diff")
+
+Run `python -m crsparser.diff -h` from the root project directory for usage.
+"""
+
+import argparse
+import sys
+from collections import OrderedDict
+
+import crsparser.export as export
+from crsparser.parse import Parser
+
+# Kinds of changes
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# Fields compared for every section, in order
+SECTION_FIELDS = ["days", "time", "prof", "loc", "capacity", "units"]
+
+# Columns of each table, in order; "changed" is the space-separated list of
+# the fields that changed, and old_* and new_* are None for added and removed
+# rows respectively
+TABLES = OrderedDict([
+    ("course_changes", ["change_id", "change", "dept", "number", "changed",
+                        "old_name", "new_name"]),
+    ("section_changes", ["change_id", "change", "dept", "number", "section", "kind",
+                         "changed"] +
+                        [prefix + f for f in SECTION_FIELDS for prefix in ("old_", "new_")])
+])
+
+def iter_diff(old_depts, new_depts):
+    """
+    Generator that yields (table name, row tuple) for every course and section
+    that was added, removed or changed from old_depts to new_depts (lists of
+    Departments). Changes are yielded in the order of the new catalog, then
+    the removals in the order of the old catalog. When a course is added or
+    removed, so is each of its sections.
+    """
+    old = OrderedDict()                 # Course key -> (dept name, Course)
+    for key, dept, crs in _iter_keyed(old_depts):
+        old[key] = (dept, crs)
+
+    ids = {"course_changes": 0, "section_changes": 0}
+
+    def row(table, fields):
+        ids[table] += 1
+        return table, (ids[table],) + fields
+
+    for key, dept, crs in _iter_keyed(new_depts):
+        entry = old.pop(key, None)
+        if entry is None:
+            yield row("course_changes", (ADDED, dept, crs.number, "name", None, crs.name))
+            for sec_key, sec in _sections(crs).iteritems():
+                yield row("section_changes", _section_row(ADDED, dept, crs, sec_key,
+                                                          None, sec))
+            continue
+
+        old_crs = entry[1]
+        if old_crs.name != crs.name:
+            yield row("course_changes", (CHANGED, dept, crs.number, "name",
+                                         old_crs.name, crs.name))
+        old_secs = _sections(old_crs)
+        for sec_key, sec in _sections(crs).iteritems():
+            old_sec = old_secs.pop(sec_key, None)
+            if old_sec is None:
+                yield row("section_changes", _section_row(ADDED, dept, crs, sec_key,
+                                                          None, sec))
+            elif old_sec != sec:
+                yield row("section_changes", _section_row(CHANGED, dept, crs, sec_key,
+                                                          old_sec, sec))
+        for sec_key, old_sec in old_secs.iteritems():
+            yield row("section_changes", _section_row(REMOVED, dept, crs, sec_key,
+                                                      old_sec, None))
+
+    for key, (dept, crs) in old.iteritems():
+        yield row("course_changes", (REMOVED, dept, crs.number, "name", crs.name, None))
+        for sec_key, sec in _sections(crs).iteritems():
+            yield row("section_changes", _section_row(REMOVED, dept, crs, sec_key,
+                                                      sec, None))
+
+def count_changes(rows):
+    """
+    Returns a dict mapping (table name, change) to the number of rows of the
+    given diff rows (e.g. from iter_diff()) with that change.
+    """
+    counts = {}
+    for table, r in rows:
+        key = (table, r[1])
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def _iter_keyed(depts):
+    """
+    Generator that yields (course key, department name, Course) for every
+    course in depts. The key is (department name, (prefix, numeric part,
+    suffix), k), where k counts the earlier courses of the department with
+    the same number (e.g. seminars with several topics).
+    """
+    for d in depts:
+        seen = {}
+        for c in d.courses:
+            fields = (c.prefix, c.num, c.suffix)
+            k = seen.get(fields, 0)
+            seen[fields] = k + 1
+            yield (d.name, fields, k), d.name, c
+
+def _sections(crs):
+    """
+    Returns an OrderedDict mapping the key of every section of crs, (section
+    number, k) where k counts the earlier sections with the same number, to
+    the section's (kind, field values in the order of SECTION_FIELDS). The
+    time is kept as a TimeInterval, which is compared without formatting it.
+    """
+    sections = OrderedDict()
+    for lec in crs.lec_list:
+        _add_section(sections, lec.number, ("lecture", (
+            lec.days, lec.time_intv, lec.prof_name, lec.loc,
+            lec.capacity, lec.units)))
+        for disc in lec.disc_list:
+            _add_section(sections, disc.name, ("discussion", (
+                disc.day, disc.time_intv, disc.ta_name, None, None, None)))
+    return sections
+
+def _add_section(sections, number, sec):
+    k = 0
+    while (number, k) in sections:
+        k += 1
+    sections[(number, k)] = sec
+
+def _section_row(change, dept, crs, sec_key, old, new):
+    """Returns the fields of a section_changes row (without its id)."""
+    kind = (new or old)[0]
+    old_values = old[1] if old is not None else (None,) * len(SECTION_FIELDS)
+    new_values = new[1] if new is not None else (None,) * len(SECTION_FIELDS)
+    if change == CHANGED:
+        changed = " ".join(f for f, a, b in zip(SECTION_FIELDS, old_values, new_values)
+                           if a != b)
+        if old[0] != new[0]:
+            changed = ("kind " + changed).strip()
+    else:
+        changed = " ".join(SECTION_FIELDS)
+    values = tuple(_time_text(v) if f == "time" and v is not None else v
+                   for f, a, b in zip(SECTION_FIELDS, old_values, new_values)
+                   for v in (a, b))
+    return (change, dept, crs.number, sec_key[0], kind, changed) + values
+
+def _time_text(intv):
+    """Returns a TimeInterval as text, e.g. "9:00-10:50"."""
+    return str(intv.start).strip() + "-" + str(intv.end).strip()
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare the catalogs of two terms.")
+    ap.add_argument("dept_file", help="file with list of departments")
+    ap.add_argument("old_file", help="file with the older catalog data")
+    ap.add_argument("new_file", help="file with the newer catalog data")
+    ap.add_argument("--old-depts", metavar="DEPT_FILE",
+                    help="list of departments of the older catalog, if it differs")
+    out = ap.add_mutually_exclusive_group()
+    out.add_argument("--csv", metavar="DIR", help="write one CSV file per table to DIR")
+    out.add_argument("--sqlite", metavar="FILE", help="write the tables to a SQLite database")
+    args = ap.parse_args()
+
+    new_parser = Parser()
+    new_parser.load_dept_list(args.dept_file)
+    old_parser = new_parser
+    if args.old_depts is not None:
+        old_parser = Parser()
+        old_parser.load_dept_list(args.old_depts)
+
+    rows = iter_diff(old_parser.parse_catalog(args.old_file),
+                     new_parser.parse_catalog(args.new_file))
+    if args.csv is not None:
+        counts = export.write_csv(rows, TABLES, args.csv)
+    elif args.sqlite is not None:
+        counts = export.write_sqlite(rows, TABLES, args.sqlite)
+    else:
+        counts = export.write_jsonl(rows, TABLES, sys.stdout)
+    print >> sys.stderr, ", ".join("{0} {1}".format(counts[t], t) for t in TABLES)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Exporters that write parsed catalogs to CSV, JSON Lines and SQLite. Every
+exporter takes an iterable of Departments and consumes it lazily, so passing
+Parser.iter_catalog() exports a full catalog in constant memory.
+
+The catalog is flattened into four tables, described by TABLES: departments,
+courses, lectures and discussions. Each row gets an integer id, and refers to
+its parent row by the parent's id. Times are written both as text ("13:50")
+and as minutes since midnight. Some columns are derived from others for
+querying (see crsparser.sqlcatalog): the numeric part of the course number,
+the lab and upper division flags, durations in minutes, and day masks (see
+crsparser.columnar.day_mask).
+
+The writers behind the exporters (write_csv(), write_jsonl() and
+write_sqlite()) take any stream of (table name, row) tuples and its tables,
+so other row streams, such as catalog diffs (see crsparser.diff), are
+written the same way.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+from crsparser.columnar import day_mask
+
+# Columns of each table, in order
+TABLES = OrderedDict([
+    ("departments", ["dept_id", "name"]),
+    ("courses", ["course_id", "dept_id", "number", "name", "num", "is_lab",
+                 "is_upperdiv", "duration"]),
+    ("lectures", ["lecture_id", "course_id", "number", "days", "start_time", "end_time",
+                  "start_min", "end_min", "day_mask", "duration", "prof_name", "loc",
+                  "capacity", "xc", "grade_type", "units", "same_as", "restrict"]),
+    ("discussions", ["discussion_id", "lecture_id", "name", "day", "start_time", "end_time",
+                     "start_min", "end_min", "ta_name"])
+])
+
+# SQL type of each column; columns not listed are TEXT
+SQL_TYPES = {
+    "dept_id": "INTEGER", "course_id": "INTEGER", "lecture_id": "INTEGER",
+    "discussion_id": "INTEGER", "start_min": "INTEGER", "end_min": "INTEGER",
+    "capacity": "INTEGER", "xc": "INTEGER", "units": "INTEGER", "num": "INTEGER",
+    "is_lab": "INTEGER", "is_upperdiv": "INTEGER", "duration": "INTEGER",
+    "day_mask": "INTEGER"
+}
+
+def iter_rows(depts):
+    """
+    Generator that yields (table name, row tuple) for every department, course,
+    lecture and discussion in depts, parents before their children.
+    """
+    course_id = 0
+    lecture_id = 0
+    discussion_id = 0
+    for dept_id, d in enumerate(depts):
+        yield "departments", (dept_id, d.name)
+        for c in d.courses:
+            num = c.num
+            duration = c.duration() if c.lec_list else None
+            yield "courses", (course_id, dept_id, c.number, c.name, num,
+                              int(c.islab()), int(num is not None and num >= 100), duration)
+            for lec in c.lec_list:
+                yield "lectures", ((lecture_id, course_id, lec.number, lec.days) +
+                                   _intv_fields(lec.time_intv) +
+                                   (day_mask(lec.days), lec.time_intv.duration(),
+                                    lec.prof_name, lec.loc, lec.capacity, lec.xc,
+                                    lec.grade_type, lec.units, lec.same_as, lec.restrict))
+                for disc in lec.disc_list:
+                    yield "discussions", ((discussion_id, lecture_id, disc.name, disc.day) +
+                                          _intv_fields(disc.time_intv) + (disc.ta_name,))
+                    discussion_id += 1
+                lecture_id += 1
+            course_id += 1
+
+def export_csv(depts, dirname):
+    """
+    Writes the catalog to one CSV file per table (e.g. courses.csv) in the
+    directory dirname, which is created if needed. Returns a dict mapping
+    each table name to its number of rows.
+    """
+    return write_csv(iter_rows(depts), TABLES, dirname)
+
+def export_jsonl(depts, out):
+    """
+    Writes the catalog to the file object out in JSON Lines format: one JSON
+    object per row, with a "type" key naming its table (e.g. "lectures").
+    Returns a dict mapping each table name to its number of rows.
+    """
+    return write_jsonl(iter_rows(depts), TABLES, out)
+
+def export_sqlite(depts, filename, batch_size=1000):
+    """
+    Writes the catalog to the SQLite database filename, replacing any existing
+    catalog tables, in a single transaction. Rows are inserted with
+    executemany() in batches of batch_size. Returns a dict mapping each table
+    name to its number of rows.
+    """
+    return write_sqlite(iter_rows(depts), TABLES, filename, batch_size)
+
+def write_csv(rows, tables, dirname):
+    """
+    Writes rows (an iterable of (table name, row tuple)) to one CSV file per
+    table of tables (an OrderedDict mapping table names to their columns) in
+    the directory dirname, as export_csv() does. Returns a dict mapping each
+    table name to its number of rows.
+    """
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+
+    files = {}
+    writers = {}
+    counts = dict((table, 0) for table in tables)
+    try:
+        for table, fields in tables.iteritems():
+            files[table] = open(os.path.join(dirname, table + ".csv"), "wb")
+            writers[table] = csv.writer(files[table])
+            writers[table].writerow(fields)
+        for table, row in rows:
+            writers[table].writerow(row)
+            counts[table] += 1
+    finally:
+        for f in files.itervalues():
+            f.close()
+    return counts
+
+def write_jsonl(rows, tables, out):
+    """
+    Writes rows (an iterable of (table name, row tuple)) of the given tables
+    to the file object out, as export_jsonl() does. Returns a dict mapping
+    each table name to its number of rows.
+    """
+    counts = dict((table, 0) for table in tables)
+    for table, row in rows:
+        record = dict(zip(tables[table], row))
+        record["type"] = table
+        out.write(json.dumps(record) + "\n")
+        counts[table] += 1
+    return counts
+
+def write_sqlite(rows, tables, filename, batch_size=1000):
+    """
+    Writes rows (an iterable of (table name, row tuple)) of the given tables
+    to the SQLite database filename, as export_sqlite() does. Returns a dict
+    mapping each table name to its number of rows.
+    """
+    conn = sqlite3.connect(filename)
+    try:
+        with conn:                  # One transaction; rolled back on errors
+            create_tables(conn, tables)
+            inserts = dict((table, "INSERT INTO {0} VALUES ({1})".format(
+                table, ", ".join("?" * len(fields)))) for table, fields in tables.iteritems())
+            batches = dict((table, []) for table in tables)
+            counts = dict((table, 0) for table in tables)
+            for table, row in rows:
+                batch = batches[table]
+                batch.append(row)
+                counts[table] += 1
+                if len(batch) >= batch_size:
+                    conn.executemany(inserts[table], batch)
+                    del batch[:]
+            for table, batch in batches.iteritems():
+                if batch:
+                    conn.executemany(inserts[table], batch)
+    finally:
+        conn.close()
+    return counts
+
+def create_tables(conn, tables=TABLES):
+    """
+    Drops and (re)creates the given tables (by default the catalog tables) in
+    the SQLite connection conn. The first column of each table is its key.
+    """
+    for table, fields in tables.iteritems():
+        conn.execute("DROP TABLE IF EXISTS {0}".format(table))
+        columns = ", ".join('"{0}" {1}'.format(f, SQL_TYPES.get(f, "TEXT")) for f in fields)
+        conn.execute("CREATE TABLE {0} ({1}, PRIMARY KEY ({2}))".format(table, columns, fields[0]))
+
+def _intv_fields(intv):
+    """Returns (start text, end text, start minutes, end minutes) of a TimeInterval."""
+    return (str(intv.start).strip(), str(intv.end).strip(),
+            intv.start.minutes(), intv.end.minutes())
@@ -3,8 +3,15 @@ Provides the capability to filter Courses from a Catalog (i.e. select courses
 with certain criteria). To assist with filtering, this module contains
 functions that return functions f: Course -> bool that wrap functions
 in Course (because filter() expects functions with only one argument).
+
+Every function returned by this module is tagged with the name of the module
+function that created it (fn.filter_name) and its argument (fn.filter_arg, or
+None), so that other evaluators such as crsparser.columnar can recognize it.
 """
 
+import crsparser.planner as planner
+import crsparser.stats as stats
+
 def filter(courses, fn_list):
     """
     Returns a list of booleans indicating whether the corresponding course
@@ -15,6 +22,9 @@ def filter(courses, fn_list):
     courses - list of courses to filter
     fn_list - list of functions f: Course -> bool
     """
+    if stats.enabled:
+        fn_list = [stats.timed("filter." + planner.describe(fn), fn) for fn in fn_list]
+
     bools = [True] * len(courses)
     for i in xrange(len(courses)):
         for fn in fn_list:
@@ -24,59 +34,81 @@ def filter(courses, fn_list):
                 break
     return bools
 
+def query(text):
+    """
+    Returns a function that returns true if the Course matches the given filter
+    expression, e.g. "duration >= 50 and not islab"; see crsparser.query for
+    the syntax. Raises a crsparser.query.QueryError if text is malformed.
+    """
+    import crsparser.query                      # Imports this module
+    return crsparser.query.compile_query(text)
+
 def duration_eq(n):
     """
     Returns a function that returns true if the Course's duration is exactly
     equal to n.
     """
-    return lambda crs: crs.duration() == n
+    return _tag(lambda crs: crs.duration() == n, "duration_eq", n)
 
 def duration_ge(n):
     """
     Returns a function that returns true if the Course's duration is greater
     than or equal to n.
     """
-    return lambda crs: crs.duration() >= n
+    return _tag(lambda crs: crs.duration() >= n, "duration_ge", n)
 
 def duration_le(n):
     """
     Returns a function that returns true if the Course's duration is less
     than or equal to n.
     """
-    return lambda crs: crs.duration() <= n
+    return _tag(lambda crs: crs.duration() <= n, "duration_le", n)
 
 def islab():
     """Returns a function that returns true if the Course is a lab."""
-    return lambda crs: crs.islab()
+    return _tag(lambda crs: crs.islab(), "islab")
 
 def isupperdiv():
     """Returns a function that returns true if the Course is an upper division course."""
-    return lambda crs: crs.isupperdiv()
+    return _tag(lambda crs: crs.isupperdiv(), "isupperdiv")
 
 def occurs_after(time):
     """
     Returns a function that returns true if the Course starts at or after
     the given time (Time object).
     """
-    return lambda crs: crs.occurs_after(time)
+    return _tag(lambda crs: crs.occurs_after(time), "occurs_after", time)
 
 def occurs_before(time):
     """
     Returns a function that returns true if the Course ends at or before
     the given time (Time object).
     """
-    return lambda crs: crs.occurs_before(time)
+    return _tag(lambda crs: crs.occurs_before(time), "occurs_before", time)
+
+def occurs_during(time_intv):
+    """
+    Returns a function that returns true if the Course has a Lecture that lies
+    within the given time interval (TimeInterval object).
+    """
+    return _tag(lambda crs: crs.occurs_during(time_intv), "occurs_during", time_intv)
 
 def starts_at(time):
     """
     Returns a function that returns true if the Course has a Lecture that
     starts at the specified time (Time object).
     """
-    return lambda crs: crs.starts_at(time)
+    return _tag(lambda crs: crs.starts_at(time), "starts_at", time)
 
 def ends_at(time):
     """
     Returns a function that returns true if the Course has a Lecture that
     ends at the specified time (Time object).
     """
-    return lambda crs: crs.ends_at(time)
+    return _tag(lambda crs: crs.ends_at(time), "ends_at", time)
+
+def _tag(fn, name, arg=None):
+    """Tags fn with the name and argument of the filter that created it."""
+    fn.filter_name = name
+    fn.filter_arg = arg
+    return fn
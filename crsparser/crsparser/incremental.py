@@ -0,0 +1,121 @@
+"""
+Incremental re-parsing of a catalog file. The registrar updates the catalog a
+few departments at a time, so an IncrementalCatalog remembers a hash of every
+department's text and, when refreshed, only re-parses the departments whose
+text changed, reusing the Department objects of all the others.
+"""
+
+import hashlib
+
+from crsparser.course import Department
+import crsparser.lexer as lexer
+from crsparser.parse import Parser
+
+class ChangeSummary(object):
+    """
+    The changes between two versions of a catalog. Departments are identified
+    by name, and courses by (department name, course key) tuples, where the
+    course key is str(course), e.g. "35L SOFTWARE CONST LAB".
+    """
+    def __init__(self):
+        self.added_depts = []
+        self.removed_depts = []
+        self.changed_depts = []
+        self.added_courses = []
+        self.removed_courses = []
+        self.changed_courses = []
+
+    def __nonzero__(self):
+        """Returns true if anything changed."""
+        return bool(self.added_depts or self.removed_depts or self.changed_depts)
+
+    def __str__(self):
+        """Returns a short summary, e.g. "1 dept(s) changed, 3 course(s) added"."""
+        parts = []
+        for what, items in [("dept(s) added", self.added_depts),
+                            ("dept(s) removed", self.removed_depts),
+                            ("dept(s) changed", self.changed_depts),
+                            ("course(s) added", self.added_courses),
+                            ("course(s) removed", self.removed_courses),
+                            ("course(s) changed", self.changed_courses)]:
+            if items:
+                parts.append("{0} {1}".format(len(items), what))
+        return ", ".join(parts) if parts else "no changes"
+
+class IncrementalCatalog(object):
+    """
+    A parsed catalog that can be refreshed from newer versions of its file.
+    """
+    def __init__(self, parser):
+        """
+        Arguments:
+
+        parser - Parser with the department list of the catalog
+        """
+        self.parser = parser
+        self.depts = []             # List of Departments, in file order
+        self._dept_hashes = {}      # Department name -> hash of its text
+        self._course_hashes = {}    # Department name -> {course key: hash}
+
+    def refresh(self, filename):
+        """
+        Brings self.depts up to date with the given catalog file, re-parsing
+        only the departments that were added or whose text changed, and
+        returns a ChangeSummary of what changed since the last refresh.
+        """
+        summary = ChangeSummary()
+        old_depts = dict((d.name, d) for d in self.depts)
+        depts = []
+        dept_hashes = {}
+        course_hashes = {}
+
+        for name, text in self.parser.iter_dept_text(filename):
+            h = hashlib.sha1(text).digest()
+            dept_hashes[name] = h
+            if self._dept_hashes.get(name) == h:
+                depts.append(old_depts[name])
+                course_hashes[name] = self._course_hashes[name]
+                continue
+
+            courses = []
+            hashes = {}
+            tokens = lexer.tokenize(Parser.text_lines(text))
+            for course_tokens in lexer.iter_course_tokens(tokens):
+                c = Parser.build_course(course_tokens)
+                courses.append(c)
+                key = str(c)
+                # Courses with the same key (e.g. seminar topics) share one hash
+                hashes[key] = hashlib.sha1(hashes.get(key, "") + "\n".join(
+                    ln for _, ln, _ in course_tokens)).digest()
+            depts.append(Department(name, courses))
+            course_hashes[name] = hashes
+
+            if name in self._dept_hashes:
+                summary.changed_depts.append(name)
+                self._diff_courses(summary, name, self._course_hashes[name], hashes)
+            else:
+                summary.added_depts.append(name)
+                summary.added_courses.extend((name, key) for key in sorted(hashes))
+
+        for d in self.depts:
+            if d.name not in dept_hashes:
+                summary.removed_depts.append(d.name)
+                summary.removed_courses.extend(
+                    (d.name, key) for key in sorted(self._course_hashes[d.name]))
+
+        self.depts = depts
+        self._dept_hashes = dept_hashes
+        self._course_hashes = course_hashes
+        return summary
+
+    @staticmethod
+    def _diff_courses(summary, dept, old, new):
+        """Adds the differences between two {course key: hash} dicts to summary."""
+        for key in sorted(new):
+            if key not in old:
+                summary.added_courses.append((dept, key))
+            elif old[key] != new[key]:
+                summary.changed_courses.append((dept, key))
+        for key in sorted(old):
+            if key not in new:
+                summary.removed_courses.append((dept, key))
@@ -0,0 +1,125 @@
+"""
+Classifies the lines of a department's course listings into tokens, so that
+every line is examined exactly once. Cheap checks on the text come first
+(continuation prefixes, and the colon that every section's time contains),
+and only the remaining lines are matched against the precompiled title and
+section patterns. The matches are kept in the tokens, so course assembly
+(see Parser.build_course()) reads the fields without matching again.
+
+A token is a tuple (kind, line, match), where kind is one of the constants
+below and match is the regex match of a TITLE, LECTURE or SECTION line (None
+for the other kinds).
+"""
+
+import re
+
+import crsparser.stats as stats
+from crsparser.util.time import Time
+
+# Matches course title (e.g. 100 COURSE TITLE Y)
+COURSE_TITLE_REGEX = \
+        (r"(?P<number>\w+\b)\s+"         # Catalog number
+         r"(?P<name>.+)\s+(Y|N)\s+")     # Class name; must trim trailing whitespace
+
+# Matches a lecture, starting optionally with a Y/N
+COURSE_LEC_REGEX = \
+        (r"(Y|N)?\s*"
+         r"((?P<dashes>-+)|"
+         r"(?P<lec_id>[0-9]{3}-[0-9]{3}-[0-9]{3}))\s+"
+         r"(?P<class_type>\w+)\s+"              # Class type, e.g. LEC or SEM
+         r"(?P<sec_num>[0-9][a-zA-Z]?)\s+"      # Section number
+         r"(?P<days>\w+)\s+"                    # Days held
+         r"(?P<time_start>" + Time.TIME_REGEX + r")\s*-\s*" # Time start
+         r"(?P<time_end>" + Time.TIME_REGEX + r")\s+"       # Time end
+         r"(?P<loc>[^0-9]+[0-9]+[a-zA-z]*)?\s*" # Optional: Location (depends on number at end)
+         r"(?P<prof>[^0-9]*)?\s*"               # Optional: Professor name
+         r"(?P<capac>[0-9]+)\s+"                # Enrollment capacity
+         r"(?P<xc>[0-9]+)\s+"                   # Exam code
+         r"(?P<grade_type>[a-zA-Z]+)\s+"        # Grade type
+         r"(?P<units>[0-9])\.")                 # Number of units (< 10)
+
+# Full line: a course title followed by its first lecture
+COURSE_ALL_REGEX = COURSE_TITLE_REGEX + COURSE_LEC_REGEX
+
+TITLE_PATTERN = re.compile(COURSE_ALL_REGEX)
+SECTION_PATTERN = re.compile(COURSE_LEC_REGEX)
+
+# Token kinds
+TITLE = 0           # Course title and its first lecture
+LECTURE = 1         # Lecture, e.g. section "2"
+SECTION = 2         # Discussion or lab of a lecture, e.g. section "2A"
+SAME_AS = 3         # "SAME AS: ..." line
+RESTRICT = 4        # "RESTRICT: ..." line
+NOISE = 5           # Anything else, e.g. page headers
+KIND_NAMES = ["title", "lecture", "section", "same_as", "restrict", "noise"]
+
+SAME_AS_PREFIX = "SAME AS"
+RESTRICT_PREFIX = "RESTRICT"
+
+_PROFILED = (stats.timed("regex.course_all", TITLE_PATTERN.match),
+             stats.timed("regex.course_lec", SECTION_PATTERN.search))
+
+def tokenize(lines):
+    """
+    Generator that yields the token of each of the given (stripped) lines.
+    When stats are enabled, the number of tokens of each kind is added to the
+    counters "lex.<kind name>" once all lines have been read.
+    """
+    if not stats.enabled:
+        return _tokenize(lines, TITLE_PATTERN.match, SECTION_PATTERN.search, None)
+    return _tokenize(lines, _PROFILED[0], _PROFILED[1], [0] * len(KIND_NAMES))
+
+def classify(line):
+    """Returns the token of the (stripped) line."""
+    for token in _tokenize((line,), TITLE_PATTERN.match, SECTION_PATTERN.search, None):
+        return token
+
+def iter_course_tokens(tokens):
+    """
+    Generator that splits the tokens of one department into courses, yielding
+    the list of tokens of each course (starting with its TITLE token). Tokens
+    before the first title are ignored.
+    """
+    course = None
+    for token in tokens:
+        if token[0] == TITLE:
+            if course is not None:
+                yield course
+            course = [token]
+        elif course is not None:
+            course.append(token)
+
+    if course is not None:
+        yield course
+
+def _tokenize(lines, match_title, search_section, counts):
+    """
+    Generator version of tokenize() with the given match functions; counts is
+    a list of the number of tokens of each kind to add to the stats, or None.
+    """
+    for ln in lines:
+        if ln.startswith(SAME_AS_PREFIX):
+            token = (SAME_AS, ln, None)
+        elif ln.startswith(RESTRICT_PREFIX):
+            token = (RESTRICT, ln, None)
+        elif ":" not in ln:             # Every section has a time, e.g. "9:00"
+            token = (NOISE, ln, None)
+        else:
+            r = match_title(ln)
+            if r is not None:
+                token = (TITLE, ln, r)
+            else:
+                r = search_section(ln)
+                if r is None:
+                    token = (NOISE, ln, None)
+                elif r.group("sec_num")[-1].isalpha():
+                    token = (SECTION, ln, r)
+                else:
+                    token = (LECTURE, ln, r)
+        if counts is not None:
+            counts[token[0]] += 1
+        yield token
+
+    if counts is not None:
+        for kind, n in enumerate(counts):
+            stats.incr("lex." + KIND_NAMES[kind], n)
@@ -0,0 +1,64 @@
+"""
+An index of a parsed catalog by course number. Numbers are compared by their
+fields (see course.split_number()), so "35l", "35L" and "035L" are the same
+number. Courses can be looked up by exact number, or by a range of the numeric
+part, within one department or across the whole catalog.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from crsparser.course import split_number
+
+class NumberIndex(object):
+    """An index of the courses of a list of Departments by course number."""
+    def __init__(self, depts):
+        """
+        Builds the index of every course in depts (a list of Departments).
+        Results are returned as (Department, Course) pairs, in catalog order
+        for courses with the same numeric part.
+        """
+        self.depts = depts
+        self._by_number = {}        # (prefix, num, suffix) -> list of pairs
+        self._by_dept_number = {}   # (dept name, (prefix, num, suffix)) -> list of pairs
+        self._ranges = {}           # Dept name or None -> (sorted nums, pairs)
+
+        all_pairs = []
+        for d in depts:
+            pairs = []
+            for c in d.courses:
+                pair = (d, c)
+                fields = (c.prefix, c.num, c.suffix)
+                self._by_number.setdefault(fields, []).append(pair)
+                self._by_dept_number.setdefault((d.name, fields), []).append(pair)
+                if c.num is not None:
+                    pairs.append(pair)
+            self._ranges[d.name] = _sorted_by_num(pairs)
+            all_pairs.extend(pairs)
+        self._ranges[None] = _sorted_by_num(all_pairs)
+
+    def find(self, number, dept=None):
+        """
+        Returns the list of courses with the given catalog number (e.g. "35L")
+        in the department named dept, or in every department if dept is None.
+        """
+        if dept is None:
+            return list(self._by_number.get(split_number(number), []))
+        return list(self._by_dept_number.get((dept, split_number(number)), []))
+
+    def between(self, lo, hi, dept=None):
+        """
+        Returns the list of courses whose numeric part is at least lo and at
+        most hi (e.g. 100 and 199), in order of their numeric part, in the
+        department named dept, or in every department if dept is None.
+        Returns an empty list for unknown departments.
+        """
+        nums, pairs = self._ranges.get(dept, ([], []))
+        return pairs[bisect_left(nums, lo):bisect_right(nums, hi)]
+
+def _sorted_by_num(pairs):
+    """
+    Returns (list of numeric parts, list of pairs) of the given (Department,
+    Course) pairs, sorted by numeric part (stable, so ties keep their order).
+    """
+    pairs = sorted(pairs, key=lambda p: p[1].num)
+    return [p[1].num for p in pairs], pairs
@@ -1,58 +1,64 @@
+import itertools
+import mmap
+import multiprocessing
+import operator
+import os
 import re
-from crsparser.course import Department, Course, Lecture
-import crsparser.util.utils as utils
-from crsparser.util.time import Time, TimeInterval
+import sys
+import threading
+from crsparser.course import Department, Course, Lecture, Discussion
+import crsparser.lexer as lexer
+import crsparser.stats as stats
+from crsparser.util.time import TimeInterval
+
+# The constructors used by Parser.build_course(), and the versions that record
+# their calls when stats are enabled (see crsparser.stats)
+_PLAIN = (Course, Lecture, Discussion, TimeInterval)
+_PROFILED = (stats.timed("build.course", Course),
+             stats.timed("build.lecture", Lecture),
+             stats.timed("build.discussion", Discussion),
+             stats.timed("build.time_interval", TimeInterval))
 
 class Parser(object):
     """
-    Class that allows users to parse the course catalog. All methods are
-    class methods; there is no need to instantiate any Parser objects.
+    Parser of course catalogs. Each Parser owns its list of departments and
+    its cache of department offsets, so separate Parsers are independent, and
+    one Parser can be used by several threads at once: its department list
+    is only read while parsing, the cache is locked, and the patterns of the
+    lexer are compiled once and shared. Methods that do not depend on the
+    department list are static.
     """
-    # Matches course title (e.g. 100 COURSE TITLE Y)
-    COURSE_TITLE_REGEX = \
-            (r"(?P<number>\w+\b)\s+"         # Catalog number
-             r"(?P<name>.+)\s+(Y|N)\s+")     # Class name; must trim trailing whitespace
-
-    # Matches a lecture, starting optionally with a Y/N
-    COURSE_LEC_REGEX = \
-            (r"(Y|N)?\s*"
-             r"((?P<dashes>-+)|"
-             r"(?P<lec_id>[0-9]{3}-[0-9]{3}-[0-9]{3}))\s+"
-             r"(?P<class_type>\w+)\s+"              # Class type, e.g. LEC or SEM
-             r"(?P<sec_num>[0-9][a-zA-Z]?)\s+"      # Section number
-             r"(?P<days>\w+)\s+"                    # Days held
-             r"(?P<time_start>" + Time.TIME_REGEX + r")\s*-\s*" # Time start
-             r"(?P<time_end>" + Time.TIME_REGEX + r")\s+"       # Time end
-             r"(?P<loc>[^0-9]+[0-9]+[a-zA-z]*)?\s*" # Optional: Location (depends on number at end)
-             r"(?P<prof>[^0-9]*)?\s*"               # Optional: Professor name
-             r"(?P<capac>[0-9]+)\s+"                # Enrollment capacity
-             r"(?P<xc>[0-9]+)\s+"                   # Exam code
-             r"(?P<grade_type>[a-zA-Z]+)\s+"        # Grade type
-             r"(?P<units>[0-9])\.")                 # Number of units (< 10)
-
-    # Full line
-    COURSE_ALL_REGEX = COURSE_TITLE_REGEX + COURSE_LEC_REGEX
-
-    # List of all departments, in the order they will be encountered
-    # in the listings (for UCLA, it's alphabetical).
-    dept_list = []
-
-    def __init__(self):
-        raise RuntimeError("What do you think you're doing?")
+    # Patterns of course titles, lectures and full lines (see crsparser.lexer)
+    COURSE_TITLE_REGEX = lexer.COURSE_TITLE_REGEX
+    COURSE_LEC_REGEX = lexer.COURSE_LEC_REGEX
+    COURSE_ALL_REGEX = lexer.COURSE_ALL_REGEX
 
-    @staticmethod
-    def load_dept_list(filename):
+    def __init__(self, dept_list=None):
+        """
+        Arguments:
+
+        dept_list - list of all departments, in the order they will be
+                    encountered in the listings (for UCLA, it's alphabetical);
+                    can also be loaded with load_dept_list()
+        """
+        self.dept_list = list(dept_list) if dept_list is not None else []
+
+        # Cached department offsets; maps absolute filename to a tuple of
+        # ((size, mtime, dept_list), list of (dept, start, end))
+        self._index_cache = {}
+        self._index_lock = threading.Lock()
+
+    def load_dept_list(self, filename):
         """
-        Loads the department names from the file with the given filename. Expects
-        each line in the file to be a single department name.
+        Loads the department names from the file with the given filename,
+        replacing the current list. Expects each line in the file to be a
+        single department name.
         Note that parse_catalog assumes that the department name in the data file
         is *exactly* the same as in the department file (i.e. case sensitive, though
         whitespace is stripped).
         """
         with open(filename) as f:
-            lines = f.readlines()
-            for ln in lines:
-                Parser.dept_list.append(ln.strip())
+            self.dept_list = [ln.strip() for ln in f]
 
     @staticmethod
     def parse_single_course(line):
@@ -64,134 +70,319 @@ class Parser(object):
         r = re.match(Parser.COURSE_LEC_REGEX, line)
         print r.groups()
 
-    @staticmethod
-    def parse_catalog(filename):
+    def parse_catalog(self, filename, workers=None):
         """
         Parses the course listings in the given file (represented by the filename)
         and returns a list of all the departments, which each contain a list of
-        classes. The user must call Parser.load_dept_list() with the proper
-        department names or else this function raises an error.
+        classes. The Parser must be given the proper department names (see
+        load_dept_list()) or else this function raises an error.
+
+        If workers is greater than 1, the departments are parsed in parallel by
+        a pool of that many processes; the result is the same as parsing serially.
         """
-        if Parser.dept_list == []:
+        if self.dept_list == []:
             raise RuntimeError("List of departments is empty.")
 
-        infile = open(filename)
-        depts = []
-
-        # Temp variables
-        line = infile.readline().strip()
-        lines = []
-        Parser.dept_list.append("\x00\x01\x02")  # So dept_list[i+1] doesn't raise an error
-        Parser.dept_list.append("\x00\x01\x02")
-        n = len(Parser.dept_list) - 2            # "Real" length of dept_list
-        i = 0
-
-        # Set up first department match
-        # Look ahead only one department if the current department does not exist
-        while (i < n and line != "" and line != Parser.dept_list[i] and
-               line != Parser.dept_list[i+1]):
-            line = infile.readline().strip()
-
-        # Account for look-ahead
-        if i + 1 < n and line == Parser.dept_list[i+1]:
-            print "Skipped over:", Parser.dept_list[i]
-            i += 1
-
-        while i < n and line != "":
-            # Get all lines before next department name
-            line = infile.readline()
-            i += 1
-            if i > n:
-                break
-
-            while (line != "" and line != Parser.dept_list[i] and
-                   line != Parser.dept_list[i+1]):
-                lines.append(line)
-                line = infile.readline().strip()
-
-            if i + 1 < n and line == Parser.dept_list[i+1]:
-                print "Skipped over:", Parser.dept_list[i]
-                i += 1
-
-            # Parse all lines in department
-            d = Parser.parse_dept(Parser.dept_list[i - 1], lines)
-            depts.append(d)
-            lines = []
-
-        Parser.dept_list.pop()
-        Parser.dept_list.pop()
-        infile.close()
-
-        return depts
+        with stats.timer("catalog.parse"):
+            ranges = self.index_catalog(filename)
+            if workers is None or workers <= 1:
+                return [_parse_range((filename, dept, start, end), mm)
+                        for mm in _mmap_catalog(filename)
+                        for dept, start, end in ranges]
+
+            jobs = [(filename, dept, start, end) for dept, start, end in ranges]
+            pool = multiprocessing.Pool(workers)
+            try:
+                depts = pool.map(_parse_range, jobs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            return depts
+
+    def parse_department(self, filename, dept):
+        """
+        Parses only the department named dept in the given catalog file and
+        returns it, or returns None if the department is not in the file. The
+        other departments are never parsed, and the department offsets are
+        reused across calls as long as the file does not change.
+        """
+        for name, start, end in self.index_catalog(filename):
+            if name == dept:
+                return _parse_range((filename, name, start, end))
+        return None
+
+    def index_catalog(self, filename):
+        """
+        Returns a list of (department name, start, end) tuples, in file order,
+        where start and end are the byte offsets of the department's lines
+        (excluding its header) in the file with the given filename.
+
+        The file is memory-mapped and scanned once; the result is cached until
+        the file's size or modification time (or the department list) changes.
+        """
+        st = os.stat(filename)
+        path = os.path.abspath(filename)
+        dept_list = self.dept_list          # Unaffected by load_dept_list() from now on
+        key = (st.st_size, st.st_mtime, tuple(dept_list))
+        with self._index_lock:
+            cached = self._index_cache.get(path)
+        if cached is not None and cached[0] == key:
+            stats.incr("catalog.index_cache_hits")
+            return list(cached[1])
+
+        dept_index = Parser._dept_index(dept_list)
+        ranges = []
+        dept = None
+        start = 0
+        i = 0                       # Index of the next expected department
+        n_lines = 0
+        with stats.timer("catalog.index"):
+            for mm in _mmap_catalog(filename):
+                size = len(mm)
+                pos = 0
+                while pos < size:
+                    nl = mm.find("\n", pos)
+                    nxt = size if nl < 0 else nl + 1
+                    found = Parser._match_header(mm[pos:nxt].strip(), i, dept_list,
+                                                 dept_index)
+                    if found >= 0:
+                        if dept is not None:
+                            ranges.append((dept, start, pos))
+                        dept = dept_list[found]
+                        i = found + 1
+                        start = nxt
+                    pos = nxt
+                    n_lines += 1
+
+                if dept is not None:
+                    ranges.append((dept, start, size))
+
+        stats.incr("catalog.lines", n_lines)
+        stats.incr("catalog.depts", len(ranges))
+        with self._index_lock:
+            self._index_cache[path] = (key, ranges)
+        return list(ranges)
+
+    def iter_dept_text(self, filename):
+        """
+        Generator that yields (department name, text) for every department in
+        the given catalog file, where text is the raw text of the department's
+        lines (excluding its header).
+        """
+        ranges = self.index_catalog(filename)
+        for mm in _mmap_catalog(filename):
+            for dept, start, end in ranges:
+                yield dept, mm[start:end]
+
+    @staticmethod
+    def text_lines(text):
+        """
+        Returns a generator over the stripped, nonempty lines of text, as
+        expected by Parser.parse_dept().
+        """
+        return (ln for ln in (l.strip() for l in text.split("\n")) if ln != "")
+
+    def iter_catalog(self, source, courses=False):
+        """
+        Generator version of parse_catalog(). Yields each Department as soon as
+        its block has been read, so only one department is held in memory at a
+        time. If courses is True, yields (department name, Course) tuples as soon
+        as each course has been read instead.
+
+        Arguments:
+
+        source - filename or file object containing the course listings
+        courses - whether to yield individual courses instead of departments
+        """
+        if self.dept_list == []:
+            raise RuntimeError("List of departments is empty.")
+
+        if isinstance(source, basestring):
+            infile = open(source)
+        else:
+            infile = source
+
+        try:
+            dept_lines = self._iter_dept_lines(infile)
+            for dept, group in itertools.groupby(dept_lines, operator.itemgetter(0)):
+                lines = (ln for _, ln in group if ln is not None)
+                if courses:
+                    for c in Parser.iter_courses(lines):
+                        yield dept, c
+                else:
+                    yield Parser.parse_dept(dept, lines)
+        finally:
+            if infile is not source:
+                infile.close()
+
+    def _iter_dept_lines(self, infile):
+        """
+        Reads infile line by line and yields (department name, line) for every
+        line belonging to a department, and (department name, None) when the
+        department header itself is read. Departments are expected in the order
+        of the department list; missing departments are skipped over.
+        """
+        dept_list = self.dept_list
+        dept_index = Parser._dept_index(dept_list)
+        i = 0                       # Index of the next expected department
+        dept = None
+        for line in infile:
+            line = line.strip()
+            found = Parser._match_header(line, i, dept_list, dept_index)
+            if found < 0:
+                if dept is not None and line != "":
+                    yield dept, line
+                continue
+
+            dept = dept_list[found]
+            i = found + 1
+            yield dept, None
+
+    @staticmethod
+    def _dept_index(dept_list):
+        """Returns a dict mapping each name in dept_list to its index."""
+        return dict((d, k) for k, d in enumerate(dept_list))
+
+    @staticmethod
+    def _match_header(line, i, dept_list, dept_index):
+        """
+        Returns the index in dept_list of the department whose header is the
+        (stripped) line, or -1 if line is not a header. Only departments at or
+        after index i (the next expected department) are considered.
+
+        dept_index - dict returned by Parser._dept_index(dept_list)
+        """
+        found = dept_index.get(line, -1)
+        if found < i:
+            return -1
+        for k in xrange(i, found):
+            print >> sys.stderr, "Skipped over:", dept_list[k]
+            stats.incr("catalog.skipped_depts")
+        return found
 
     @staticmethod
     def parse_course(lines):
-        lec_list = []
+        """
+        Parses the lines of one course (starting with its title line) and
+        returns the Course (see Parser.build_course()).
+        """
+        return Parser.build_course(list(lexer.tokenize(lines)))
 
-        # Temporary variables
-        disc_list = []
-        info_dict = {}
+    @staticmethod
+    def build_course(tokens):
+        """
+        Returns the Course made of the given tokens of one course (see
+        crsparser.lexer), starting with its TITLE token. A SECTION (e.g. "1A")
+        is a discussion of the lecture with the same number (e.g. "1"), or of
+        the latest lecture if there is no such lecture; other sections are
+        lectures, each with its own list of discussions. SAME AS and RESTRICT
+        lines are stored in the same_as and restrict of the latest lecture.
+        """
+        lec_list = []
+        lecs_by_num = {}            # Section number -> Lecture
+        new_course, new_lecture, new_discussion, new_intv = \
+            _PROFILED if stats.enabled else _PLAIN
 
-        # First lecture
-        r = re.match(Parser.COURSE_TITLE_REGEX, lines[0])
+        r = tokens[0][2]
         name = r.group("name").strip()
         number = r.group("number")
 
-        # Rest of lectures
-        for ln in lines:
-            r = re.search(Parser.COURSE_LEC_REGEX, ln)
-            if r is not None:
-                # Same as above
-                sec_num = r.group("sec_num")
-                days = r.group("days")
-                time_start = r.group("time_start")
-                time_end = r.group("time_end")
-                loc = r.group("loc")
-                prof = r.group("prof").strip()
-
-                capac = r.group("capac")
-                xc = r.group("xc")
-                grade_type = r.group("grade_type")
-                units = r.group("units")
-                info_dict[Lecture.INFO_KEYS[0]] = loc
-                info_dict[Lecture.INFO_KEYS[1]] = capac
-                info_dict[Lecture.INFO_KEYS[2]] = xc
-                info_dict[Lecture.INFO_KEYS[3]] = grade_type
-                info_dict[Lecture.INFO_KEYS[4]] = units
-
-                h = utils.stoi(time_start)  # Since time_start does not have a suffix, add one if in afternoon
-                if h / 100 < 8:
-                    time_start += "p"
-
-                lec = Lecture(sec_num, days, prof, TimeInterval(time_start, time_end),
-                              info_dict, disc_list)
-                lec_list.append(lec)
-
-        return Course(name, number, lec_list)
+        for kind, ln, r in tokens:
+            if kind == lexer.SAME_AS or kind == lexer.RESTRICT:
+                if lec_list:
+                    lec = lec_list[-1]
+                    if kind == lexer.SAME_AS:
+                        lec.same_as = ln if lec.same_as is None else lec.same_as + "\n" + ln
+                    else:
+                        lec.restrict = ln if lec.restrict is None else lec.restrict + "\n" + ln
+                continue
+            elif r is None:
+                continue
+
+            sec_num = r.group("sec_num")
+            days = r.group("days")
+            time_start = r.group("time_start")
+            prof = r.group("prof").strip()
+
+            # Since time_start does not have a suffix, add one if in afternoon
+            if int(time_start.partition(":")[0]) < 8:
+                time_start += "p"
+            time_intv = new_intv(time_start, r.group("time_end"))
+
+            if kind == lexer.SECTION and lec_list:
+                lec = lecs_by_num.get(sec_num[:-1], lec_list[-1])
+                lec.disc_list.append(new_discussion(sec_num, days, prof, time_intv))
+                continue
+
+            info_dict = {}
+            info_dict[Lecture.INFO_KEYS[0]] = r.group("loc")
+            info_dict[Lecture.INFO_KEYS[1]] = r.group("capac")
+            info_dict[Lecture.INFO_KEYS[2]] = r.group("xc")
+            info_dict[Lecture.INFO_KEYS[3]] = r.group("grade_type")
+            info_dict[Lecture.INFO_KEYS[4]] = r.group("units")
+
+            lec = new_lecture(sec_num, days, prof, time_intv, info_dict, [])
+            lec_list.append(lec)
+            lecs_by_num.setdefault(sec_num, lec)
+
+        return new_course(name, number, lec_list)
 
     @staticmethod
-    def parse_dept(dept, lines):
-        courses = []
-
-        # Temp variables
-        lns = []
-        i = 0
+    def iter_courses(lines):
+        """
+        Generator that yields each Course in the given lines (any iterable of
+        lines from one department) as soon as the course's last line is read.
+        Lines before the first course are ignored.
+        """
+        for tokens in lexer.iter_course_tokens(lexer.tokenize(lines)):
+            yield Parser.build_course(tokens)
 
-        # Set up first class match
-        while i < len(lines) and not re.match(Parser.COURSE_ALL_REGEX, lines[i]):
-            i += 1
+    @staticmethod
+    def iter_course_blocks(lines):
+        """
+        Generator that splits the given lines from one department into courses,
+        yielding the list of lines of each course (starting with its title line).
+        Lines before the first course are ignored.
+        """
+        for tokens in lexer.iter_course_tokens(lexer.tokenize(lines)):
+            yield [ln for _, ln, _ in tokens]
 
-        while i < len(lines):
-            lns.append(lines[i])
-            i += 1
+    @staticmethod
+    def parse_dept(dept, lines):
+        """
+        Parses the lines (any iterable) belonging to the department named dept
+        and returns the Department.
+        """
+        with stats.timer("parse.dept"):
+            return Department(dept, list(Parser.iter_courses(lines)))
 
-            # Get all lectures in class (loop until next course match)
-            while i < len(lines) and not re.match(Parser.COURSE_ALL_REGEX, lines[i]):
-                lns.append(lines[i])
-                i += 1
+def _mmap_catalog(filename):
+    """
+    Generator that yields a read-only memory map of the given file once, and
+    closes it afterwards. Yields nothing if the file is empty (empty files
+    cannot be mapped).
+    """
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+def _parse_range(job, mm=None):
+    """
+    Parses one department from a byte range of a catalog file. Module-level so
+    that it can be sent to multiprocessing workers.
 
-            c = Parser.parse_course(lns)
-            courses.append(c)
-            lns = []
+    job - tuple of (filename, department name, start offset, end offset)
+    mm - memory map of the file; if None, the file is mapped for this call
+    """
+    filename, dept, start, end = job
+    if mm is None:
+        for mm in _mmap_catalog(filename):
+            return _parse_range(job, mm)
+        return Department(dept, [])
 
-        return Department(dept, courses)
+    return Parser.parse_dept(dept, Parser.text_lines(mm[start:end]))
@@ -0,0 +1,144 @@
+"""
+A planner for chains of filters. filter.filter() runs the filters of a chain
+in the order given and stops at the first one that rejects a course, so it is
+fastest to run cheap filters that reject many courses first. The planner
+measures the cost (time per course) and selectivity (fraction of courses
+accepted) of every filter on a sample of the courses, and orders the chain by
+cost / (1 - selectivity), the expected cost of rejecting a course. The result
+is the same as for the unplanned chain, since every course must still pass
+every filter.
+"""
+
+import random
+import time
+
+# Rough relative costs of the filters in crsparser.filter, used when a filter
+# cannot be sampled (e.g. there are no courses). Time filters scan lectures.
+DEFAULT_COSTS = {
+    "duration_eq": 2.0,
+    "duration_ge": 2.0,
+    "duration_le": 2.0,
+    "islab": 1.0,
+    "isupperdiv": 3.0,
+    "occurs_after": 4.0,
+    "occurs_before": 4.0,
+    "occurs_during": 5.0,
+    "starts_at": 4.0,
+    "ends_at": 4.0,
+    "query": 8.0
+}
+
+class PlanStep(object):
+    """One filter of a Plan, with its estimated cost and selectivity."""
+    def __init__(self, fn, cost, selectivity):
+        """
+        Arguments:
+
+        fn - function f: Course -> bool
+        cost - estimated cost of calling fn on one course (seconds if sampled)
+        selectivity - estimated fraction of courses for which fn is true
+        """
+        self.fn = fn
+        self.cost = cost
+        self.selectivity = selectivity
+        self.calls = 0              # Statistics of the last Plan.filter()
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    def rank(self):
+        """Returns the expected cost of rejecting a course with this filter."""
+        if self.selectivity >= 1.0:
+            return float("inf")
+        return self.cost / (1.0 - self.selectivity)
+
+    def __str__(self):
+        """Returns the filter's description."""
+        return describe(self.fn)
+
+class Plan(object):
+    """An ordered chain of filters, as chosen by plan()."""
+    # 0 = step number, 1 = description, 2 = cost (us), 3 = selectivity,
+    # 4 = calls, 5 = rejected, 6 = elapsed time (ms)
+    STEP_FSTR = "{0:>2}. {1:<40} {2:>9.2f} {3:>6.2f} {4:>8} {5:>8} {6:>9.2f}"
+    HEADER = "{0:>2}  {1:<40} {2:>9} {3:>6} {4:>8} {5:>8} {6:>9}".format(
+        "#", "Filter", "Cost(us)", "Sel", "Calls", "Rejected", "Time(ms)")
+
+    def __init__(self, steps, sample_size):
+        self.steps = steps
+        self.sample_size = sample_size
+
+    def filter(self, courses):
+        """
+        Returns a list of booleans indicating whether the corresponding course
+        in courses passes every filter, like filter.filter(), and records the
+        calls, rejections and time of every step.
+        """
+        bools = [True] * len(courses)
+        remaining = range(len(courses))
+        for step in self.steps:
+            fn = step.fn
+            passed = []
+            t = time.time()
+            for i in remaining:
+                if fn(courses[i]):
+                    passed.append(i)
+                else:
+                    bools[i] = False
+            step.elapsed = time.time() - t
+            step.calls = len(remaining)
+            step.rejected = len(remaining) - len(passed)
+            remaining = passed
+        return bools
+
+    def __str__(self):
+        """Returns a report of the plan and the statistics of its last run."""
+        lines = ["Plan (sampled {0} course(s)):".format(self.sample_size), Plan.HEADER]
+        for k, step in enumerate(self.steps):
+            lines.append(Plan.STEP_FSTR.format(k + 1, str(step)[:40], step.cost * 1e6,
+                                               step.selectivity, step.calls,
+                                               step.rejected, step.elapsed * 1e3))
+        return "\n".join(lines)
+
+def plan(courses, fn_list, sample_size=200):
+    """
+    Returns a Plan running the filters in fn_list in the order that is
+    expected to reject courses the soonest, based on a random sample of (at
+    most sample_size) courses from courses. The sample is the same for the
+    same courses, so plans are repeatable.
+    """
+    if len(courses) <= sample_size:
+        sample = list(courses)
+    else:
+        sample = random.Random(0).sample(courses, sample_size)
+    steps = []
+    for fn in fn_list:
+        if sample:
+            t = time.time()
+            accepted = sum(1 for c in sample if fn(c))
+            cost = (time.time() - t) / len(sample)
+            steps.append(PlanStep(fn, cost, float(accepted) / len(sample)))
+        else:
+            cost = DEFAULT_COSTS.get(getattr(fn, "filter_name", None), 10.0)
+            steps.append(PlanStep(fn, cost * 1e-6, 0.5))
+
+    steps.sort(key=PlanStep.rank)   # Stable, so ties keep the given order
+    return Plan(steps, len(sample))
+
+def filter(courses, fn_list, sample_size=200):
+    """
+    Plans and runs the filters in fn_list over courses. Returns a tuple of
+    (list of booleans as returned by filter.filter(), the Plan that was run).
+    """
+    p = plan(courses, fn_list, sample_size)
+    return p.filter(courses), p
+
+def describe(fn):
+    """Returns a short description of a filter, e.g. "starts_at 9:00"."""
+    name = getattr(fn, "filter_name", None)
+    if name is None:
+        return getattr(fn, "__name__", repr(fn))
+    elif name == "query":
+        return str(fn.filter_arg)
+    elif fn.filter_arg is None:
+        return name
+    return "{0} {1}".format(name, str(fn.filter_arg).strip())
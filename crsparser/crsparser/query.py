@@ -0,0 +1,293 @@
+"""
+A small language for filter expressions, such as
+
+    duration >= 50 and (starts_at 9:00 or starts_at 10:00) and not islab
+
+An expression is parsed once into a Query, which can be used as a single
+function f: Course -> bool (compiled into one generated Python function that
+evaluates the whole expression inline), or evaluated over a ColumnStore as a
+plan of bitset operations on the masks of the filters in crsparser.filter.
+
+Grammar (keywords are case insensitive):
+
+    expr      := term ("or" term)*
+    term      := factor ("and" factor)*
+    factor    := "not" factor | "(" expr ")" | predicate
+    predicate := "duration" op INT
+               | "islab" | "isupperdiv"
+               | ("occurs_after" | "occurs_before" | "starts_at" | "ends_at") TIME
+               | "occurs_during" TIME "-" TIME
+    op        := "==" | "=" | "!=" | ">=" | "<=" | ">" | "<"
+
+where TIME is a time as accepted by Time, e.g. 9:00, 1:00p, 1:00pm or 13:00,
+with hours from 0 to 23 (1 to 12 with an am/pm suffix) and minutes from 0
+to 59.
+"""
+
+import re
+
+import crsparser.bitset as bitset
+import crsparser.filter as filter
+from crsparser.util.time import Time, TimeInterval
+
+# Group 1 = time, group 2 = integer, group 3 = word, group 4 = operator
+TOKEN_REGEX = re.compile(r"\s*(?:(\d{1,2}\s*:\s*\d{2}(?:\s*[aApP][mM]?\b)?)|(\d+)|"
+                         r"([A-Za-z_]+)|(>=|<=|==|!=|=|>|<|\(|\)|-))")
+
+TIME_FILTERS = ["occurs_after", "occurs_before", "starts_at", "ends_at"]
+
+class QueryError(ValueError):
+    """Raised for malformed filter expressions."""
+    pass
+
+class Query(object):
+    """
+    A parsed filter expression. Calling a Query on a Course returns whether
+    the course matches the expression; two Queries are equal iff they have
+    the same canonical form (str(query)).
+    """
+    def __init__(self, text):
+        """
+        Arguments:
+
+        text - filter expression; raises a QueryError if it is malformed
+        """
+        self.text = text
+        self.tree = _Parser(text).parse()
+        self.source = _to_source(self.tree)
+        self.fn = _compile(self.source)
+
+        # Tags, so that a Query can be used like the filters in crsparser.filter
+        self.filter_name = "query"
+        self.filter_arg = self
+
+    def __call__(self, crs):
+        return self.fn(crs)
+
+    def __str__(self):
+        """Returns the canonical form of the expression, fully parenthesized."""
+        return _to_text(self.tree)
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and str(self) == str(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def filters(self):
+        """Returns the list of filters (from crsparser.filter) in the expression."""
+        return list(_leaves(self.tree))
+
+    def bits(self, cache):
+        """
+        Returns the bitset of the courses matching the expression, evaluated
+        from the cached bitsets of its filters (cache is a bitset.FilterCache).
+        """
+        n = len(cache.store)
+
+        def evaluate(node):
+            kind = node[0]
+            if kind == "and":
+                return evaluate(node[1]) & evaluate(node[2])
+            elif kind == "or":
+                return evaluate(node[1]) | evaluate(node[2])
+            elif kind == "not":
+                return bitset.invert(evaluate(node[1]), n)
+            return cache.bits(node[1])
+
+        return evaluate(self.tree)
+
+    def mask(self, store):
+        """Returns the mask of the courses of store (a ColumnStore) that match."""
+        return bitset.to_mask(self.bits(bitset.FilterCache(store)), len(store))
+
+def compile_query(text):
+    """Returns a Query for the given filter expression (see the module docstring)."""
+    return Query(text)
+
+# Parse tree nodes are tuples: ("and", left, right), ("or", left, right),
+# ("not", node), or ("filter", fn) with fn a function from crsparser.filter.
+
+class _Parser(object):
+    """Recursive descent parser for filter expressions."""
+    def __init__(self, text):
+        self.text = text
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+
+    @staticmethod
+    def _tokenize(text):
+        """Returns a list of (kind, value) tokens, kind being time/int/word/op."""
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            r = TOKEN_REGEX.match(text, pos)
+            if r is None or r.end() == pos:
+                raise QueryError("Invalid character at position {0}: {1!r}"
+                                 .format(pos, text[pos:].strip()[:1]))
+            if r.group(1) is not None:
+                tokens.append(("time", r.group(1)))
+            elif r.group(2) is not None:
+                tokens.append(("int", int(r.group(2))))
+            elif r.group(3) is not None:
+                tokens.append(("word", r.group(3).lower()))
+            else:
+                tokens.append(("op", r.group(4)))
+            pos = r.end()
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self, kind=None, what=None):
+        """Consumes and returns the value of the next token, of the given kind."""
+        tok_kind, value = self._peek()
+        if tok_kind is None or (kind is not None and tok_kind != kind):
+            raise QueryError("Expected {0} in {1!r}".format(what or kind, self.text))
+        self.pos += 1
+        return value
+
+    def _accept(self, kind, value):
+        """Consumes the next token if it is (kind, value); returns whether it was."""
+        if self._peek() == (kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self):
+        node = self._expr()
+        if self.pos != len(self.tokens):
+            raise QueryError("Unexpected {0!r} in {1!r}"
+                             .format(self._peek()[1], self.text))
+        return node
+
+    def _expr(self):
+        node = self._term()
+        while self._accept("word", "or"):
+            node = ("or", node, self._term())
+        return node
+
+    def _term(self):
+        node = self._factor()
+        while self._accept("word", "and"):
+            node = ("and", node, self._factor())
+        return node
+
+    def _factor(self):
+        if self._accept("word", "not"):
+            return ("not", self._factor())
+        if self._accept("op", "("):
+            node = self._expr()
+            if not self._accept("op", ")"):
+                raise QueryError("Expected ')' in {0!r}".format(self.text))
+            return node
+        return self._predicate()
+
+    def _predicate(self):
+        word = self._next("word", "a filter name")
+        if word == "duration":
+            op = self._next("op", "a comparison")
+            n = self._next("int", "a number of minutes")
+            return _duration_node(op, n, self.text)
+        elif word == "islab":
+            return ("filter", filter.islab())
+        elif word == "isupperdiv":
+            return ("filter", filter.isupperdiv())
+        elif word in TIME_FILTERS:
+            return ("filter", getattr(filter, word)(self._time()))
+        elif word == "occurs_during":
+            start = self._time()
+            self._next("op", "'-'")
+            return ("filter", filter.occurs_during(TimeInterval(start, self._time())))
+        raise QueryError("Unknown filter {0!r} in {1!r}".format(word, self.text))
+
+    def _time(self):
+        text = self._next("time", "a time")
+        hours, rest = text.split(":")
+        hours = int(hours)
+        mins = rest.strip()[:2]
+        suffix = rest.strip()[2:]
+        if int(mins) > 59 or not (1 <= hours <= 12 if suffix else hours <= 23):
+            raise QueryError("Time out of range: {0!r} in {1!r}".format(text, self.text))
+        return Time(text)
+
+def _duration_node(op, n, text):
+    """Returns the node for "duration op n" using the duration filters."""
+    if op in ("=", "=="):
+        return ("filter", filter.duration_eq(n))
+    elif op == "!=":
+        return ("not", ("filter", filter.duration_eq(n)))
+    elif op == ">=":
+        return ("filter", filter.duration_ge(n))
+    elif op == "<=":
+        return ("filter", filter.duration_le(n))
+    elif op == ">":
+        return ("filter", filter.duration_ge(n + 1))
+    elif op == "<":
+        return ("filter", filter.duration_le(n - 1))
+    raise QueryError("Expected a comparison in {0!r}".format(text))
+
+_DURATION_OPS = {"duration_eq": "=", "duration_ge": ">=", "duration_le": "<="}
+
+def _leaves(node):
+    if node[0] == "filter":
+        yield node[1]
+    else:
+        for child in node[1:]:
+            for fn in _leaves(child):
+                yield fn
+
+def _arg_text(arg):
+    if isinstance(arg, TimeInterval):
+        return str(arg.start).strip() + "-" + str(arg.end).strip()
+    return str(arg).strip()
+
+def _to_text(node):
+    kind = node[0]
+    if kind in ("and", "or"):
+        return "({0} {1} {2})".format(_to_text(node[1]), kind, _to_text(node[2]))
+    elif kind == "not":
+        return "(not {0})".format(_to_text(node[1]))
+    fn = node[1]
+    if fn.filter_name in _DURATION_OPS:
+        return "duration {0} {1}".format(_DURATION_OPS[fn.filter_name], fn.filter_arg)
+    elif fn.filter_arg is None:
+        return fn.filter_name
+    return "{0} {1}".format(fn.filter_name, _arg_text(fn.filter_arg))
+
+# Python source of each filter as an expression over the course "crs" and its
+# lectures "lecs"; {0} is the filter's argument (in minutes for times).
+_FILTER_SOURCE = {
+    "duration_eq": "(lecs[0].time_intv.end._mins - lecs[0].time_intv.start._mins) % 1440 == {0}",
+    "duration_ge": "(lecs[0].time_intv.end._mins - lecs[0].time_intv.start._mins) % 1440 >= {0}",
+    "duration_le": "(lecs[0].time_intv.end._mins - lecs[0].time_intv.start._mins) % 1440 <= {0}",
+    "islab": "('L' in crs.suffix or 'L' in crs.prefix)",
+    "isupperdiv": "(crs.num is not None and crs.num >= 100)",
+    "occurs_after": "any(lec.time_intv.start._mins >= {0} for lec in lecs)",
+    "occurs_before": "any(lec.time_intv.end._mins <= {0} for lec in lecs)",
+    "starts_at": "any(lec.time_intv.start._mins == {0} for lec in lecs)",
+    "ends_at": "any(lec.time_intv.end._mins == {0} for lec in lecs)",
+    "occurs_during": "any(lec.time_intv.start._mins >= {0[0]} and "
+                     "lec.time_intv.end._mins <= {0[1]} for lec in lecs)"
+}
+
+def _to_source(node):
+    """Returns the Python source of the expression rooted at node."""
+    kind = node[0]
+    if kind in ("and", "or"):
+        return "({0} {1} {2})".format(_to_source(node[1]), kind, _to_source(node[2]))
+    elif kind == "not":
+        return "(not {0})".format(_to_source(node[1]))
+    fn = node[1]
+    return "(" + _FILTER_SOURCE[fn.filter_name].format(bitset.filter_key(fn)[1]) + ")"
+
+def _compile(source):
+    """Returns a function f: Course -> bool evaluating the expression source."""
+    code = "def _query(crs):\n    lecs = crs.lec_list\n    return bool({0})\n"
+    namespace = {}
+    exec code.format(source) in namespace
+    return namespace["_query"]
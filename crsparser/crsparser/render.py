@@ -0,0 +1,113 @@
+"""
+Renders the courses of a ColumnStore (see crsparser.columnar) as text, in the
+format of the command-line interface. Lines are collected in chunks that are
+written with a single write() each, and the strings of lecture times are
+cached, so even a whole catalog is written quickly. Results can be shown one
+page at a time with the offset and limit of render(); the courses before the
+page are counted without being formatted.
+"""
+
+import crsparser.bitset as bitset
+from crsparser.course import Lecture, Discussion
+
+# Number of lines collected before they are written to the output
+CHUNK_LINES = 2000
+
+DEPT_FSTR = "\n----- {0} -----\n"
+
+class Renderer(object):
+    """Writes departments, courses and lectures to a file object in chunks."""
+    def __init__(self, out, chunk_lines=CHUNK_LINES):
+        """
+        Arguments:
+
+        out - file object to write to
+        chunk_lines - number of lines to collect before writing them
+        """
+        self.out = out
+        self.chunk_lines = chunk_lines
+        self._lines = []
+        self._intv_strs = {}        # (start, end, align) -> str(TimeInterval)
+
+    def write(self, line):
+        """Adds line (a string ending with a newline) to the output."""
+        self._lines.append(line)
+        if len(self._lines) >= self.chunk_lines:
+            self.flush()
+
+    def flush(self):
+        """Writes the lines collected so far to the output."""
+        if self._lines:
+            self.out.write("".join(self._lines))
+            self._lines = []
+
+    def department(self, d):
+        """Adds the header of the Department d."""
+        self.write(DEPT_FSTR.format(d.name))
+
+    def course(self, crs):
+        """Adds the Course crs, followed by its lectures and their discussions."""
+        self.write(crs.number + " " + crs.name + "\n")
+        for lec in crs.lec_list:
+            self.write("   " + Lecture.LEC_FSTR.format(
+                lec.number, lec.days, self.interval(lec.time_intv),
+                lec.prof_name, lec.capacity) + "\n")
+            for disc in lec.disc_list:
+                self.write("      " + Discussion.DISC_FSTR.format(
+                    disc.name, disc.day, self.interval(disc.time_intv),
+                    disc.ta_name) + "\n")
+
+    def interval(self, intv):
+        """Returns str(intv) for the TimeInterval intv, formatting it only once."""
+        key = (intv.start.minutes(), intv.end.minutes(), intv.align)
+        s = self._intv_strs.get(key)
+        if s is None:
+            s = self._intv_strs[key] = str(intv)
+        return s
+
+def render(out, store, bits=None, offset=0, limit=None):
+    """
+    Writes the courses of store selected by bits to the file object out,
+    grouped by department, and returns the number of courses written.
+    Departments without any course written are left out.
+
+    Arguments:
+
+    out - file object to write to
+    store - ColumnStore of the catalog
+    bits - bitset of the selected courses (see crsparser.bitset), or None to
+           select every course
+    offset - number of selected courses to skip
+    limit - maximum number of courses to write, or None for no limit
+    """
+    r = Renderer(out)
+    mask = None if bits is None else bitset.to_mask(bits, len(store))
+    offsets = store.dept_offsets
+    written = 0
+    for k, d in enumerate(store.depts):
+        if limit is not None and written >= limit:
+            break
+        lo = offsets[k]
+        hi = offsets[k + 1]
+        n = hi - lo if mask is None else mask.count("\x01", lo, hi)
+        if n <= offset:             # Skip the whole department
+            offset -= n
+            continue
+
+        r.department(d)
+        for i in xrange(lo, hi):
+            if mask is not None and not mask[i]:
+                continue
+            elif offset > 0:
+                offset -= 1
+            elif limit is not None and written >= limit:
+                break
+            else:
+                r.course(store.courses[i])
+                written += 1
+    r.flush()
+    return written
+
+def count(store, bits=None):
+    """Returns the number of courses of store selected by bits (see render())."""
+    return len(store) if bits is None else bitset.count(bits)
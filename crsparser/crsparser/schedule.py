@@ -0,0 +1,596 @@
+"""
+Builds conflict-free weekly schedules from a list of courses. Each course is
+taken as one lecture plus, if the lecture has discussions, one of its
+discussions. The meeting times of a section are encoded as a bitmask with one
+bit per 5 minute slot of the week (see section_mask()), so two sections
+conflict iff their masks have a common bit.
+
+The search picks the course with the fewest choices that still fit the
+schedule built so far, and drops each choice after which some other course
+has no choice left. Choices with the same meeting times are searched only
+once. Schedules are ranked by score() (lower is better), and best() keeps the
+top k, pruning partial schedules whose score can no longer beat them (see
+_bound()) or whose remaining courses need more slots than they can take.
+Once k schedules are found, the choices of every remaining course whose bound
+cannot beat them are dropped as well, so the courses that are left with the
+fewest choices are searched first.
+"""
+
+import heapq
+from itertools import product
+
+DAYS = "MTWRFSU"
+SLOT_MINS = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINS
+DAY_SLOTS = (1 << SLOTS_PER_DAY) - 1            # Mask of all slots of one day
+
+# Default weights of score(), in minutes of gaps that each item is worth
+DAY_WEIGHT = 60                 # Each day with classes
+NON_PREFERRED_WEIGHT = 120      # Each day with classes that is not preferred
+
+_masks = {}                     # (days, TimeInterval) -> section mask
+_LOW = [(1 << n) - 1 for n in xrange(SLOTS_PER_DAY + 1)]   # Masks of the first n slots
+
+class Constraints(object):
+    """Restrictions on the schedules built by schedules() and best()."""
+    def __init__(self, earliest=None, latest=None, days=None, max_gap=None,
+                 max_days=None, preferred_days=None):
+        """
+        Arguments (all optional):
+
+        earliest - Time before which no section may start
+        latest - Time after which no section may end
+        days - string of the days on which sections may meet, e.g. "MTWR"
+        max_gap - maximum number of minutes between two sections on one day
+        max_days - maximum number of days with sections
+        preferred_days - string of preferred days; other days are allowed, but
+                         count against a schedule's score
+        """
+        self.earliest = earliest
+        self.latest = latest
+        self.days = days
+        self.max_gap = max_gap
+        self.max_days = max_days
+        self.preferred_days = preferred_days
+
+    def allows(self, option):
+        """Returns true if the sections of option (an Option) are allowed."""
+        if self.days is not None and option.day_bits & ~day_bits(self.days):
+            return False
+        for intv in option.intervals():
+            if self.earliest is not None and intv.start < self.earliest:
+                return False
+            if self.latest is not None and intv.end > self.latest:
+                return False
+        return True
+
+class Option(object):
+    """One way to take a course: a lecture and one of its discussions (or None)."""
+    __slots__ = ("course", "lecture", "discussion", "mask", "day_bits", "slots", "spans")
+
+    def __init__(self, course, lecture, discussion, mask):
+        self.course = course
+        self.lecture = lecture
+        self.discussion = discussion
+        self.mask = mask
+        self.day_bits = mask_day_bits(mask)
+        self.slots = _popcount(mask)
+        self.spans = day_spans(mask)
+
+    def intervals(self):
+        """Returns the TimeIntervals of the option's sections."""
+        if self.discussion is None:
+            return [self.lecture.time_intv]
+        return [self.lecture.time_intv, self.discussion.time_intv]
+
+    def __str__(self):
+        s = "LEC {0} [{1}] {2}".format(self.lecture.number, self.lecture.days,
+                                       str(self.lecture.time_intv).strip())
+        if self.discussion is not None:
+            s += " + DIS {0} [{1}] {2}".format(self.discussion.name, self.discussion.day,
+                                               str(self.discussion.time_intv).strip())
+        return s
+
+class Schedule(object):
+    """A conflict-free choice of an Option for every course."""
+    def __init__(self, choices, mask, score):
+        """
+        Arguments:
+
+        choices - list with a list of Options per course, in the order the
+                  courses were given; the Options in each list meet at the
+                  same times, so any of them can be taken
+        mask - mask of all the sections of the schedule
+        score - score() of the schedule
+        """
+        self.choices = choices
+        self.mask = mask
+        self.score = score
+
+    def options(self):
+        """Returns the list of the first Option of each course."""
+        return [opts[0] for opts in self.choices]
+
+    def alternatives(self):
+        """Returns the number of schedules with the same meeting times as this one."""
+        n = 1
+        for opts in self.choices:
+            n *= len(opts)
+        return n
+
+    def iter_options(self):
+        """Generator that yields every list of Options with this schedule's times."""
+        return (list(opts) for opts in product(*self.choices))
+
+    def __str__(self):
+        """Returns the score, followed by one line per course."""
+        lines = ["Score {0} ({1} day(s), {2} minute(s) of gaps; {3} alternative(s))".format(
+            self.score, len(days_of(self.mask)), gap_minutes(self.mask), self.alternatives())]
+        for opt in self.options():
+            lines.append("   {0:<30} {1}".format(str(opt.course), opt))
+        return "\n".join(lines)
+
+def section_mask(days, time_intv):
+    """
+    Returns the mask of a section meeting on the given days (e.g. "MWF") at
+    time_intv (a TimeInterval). Slots are rounded outwards to whole slots, and
+    intervals that pass midnight are cut off at midnight.
+    """
+    key = (days, time_intv)
+    mask = _masks.get(key)
+    if mask is None:
+        start = time_intv.start.minutes() // SLOT_MINS
+        end = -(-time_intv.end.minutes() // SLOT_MINS)
+        if end <= start:
+            end = SLOTS_PER_DAY
+        run = ((1 << (end - start)) - 1) << start
+        mask = 0
+        for d in days or "":
+            k = DAYS.find(d)
+            if k >= 0:
+                mask |= run << (k * SLOTS_PER_DAY)
+        _masks[key] = mask
+    return mask
+
+def day_bits(days):
+    """Returns the 7-bit mask of the days in the string days (bit 0 = Monday)."""
+    bits = 0
+    for d in days:
+        k = DAYS.find(d)
+        if k >= 0:
+            bits |= 1 << k
+    return bits
+
+def mask_day_bits(mask):
+    """Returns the 7-bit mask of the days with at least one slot in mask."""
+    bits = 0
+    for k in xrange(len(DAYS)):
+        if (mask >> (k * SLOTS_PER_DAY)) & DAY_SLOTS:
+            bits |= 1 << k
+    return bits
+
+def day_spans(mask):
+    """
+    Returns a list of (day index, first slot, last slot + 1, number of slots)
+    for every day with at least one slot in mask.
+    """
+    spans = []
+    for k in xrange(len(DAYS)):
+        bits = (mask >> (k * SLOTS_PER_DAY)) & DAY_SLOTS
+        if bits:
+            spans.append((k, (bits & -bits).bit_length() - 1, bits.bit_length(),
+                          _popcount(bits)))
+    return spans
+
+def day_runs(mask):
+    """
+    Returns a list of (day index, first slot, last slot + 1) for every run of
+    consecutive slots in mask, in order.
+    """
+    runs = []
+    for k in xrange(len(DAYS)):
+        bits = (mask >> (k * SLOTS_PER_DAY)) & DAY_SLOTS
+        while bits:
+            first = (bits & -bits).bit_length() - 1
+            last = ((bits >> first) + 1 & ~(bits >> first)).bit_length() - 1 + first
+            runs.append((k, first, last))
+            bits &= ~((1 << last) - 1)
+    return runs
+
+def days_of(mask):
+    """Returns the string of the days with at least one slot in mask."""
+    bits = mask_day_bits(mask)
+    return "".join(d for k, d in enumerate(DAYS) if bits & (1 << k))
+
+def day_gaps(mask):
+    """
+    Returns the list of the lengths in minutes of the gaps between sections
+    in mask, on all days.
+    """
+    gaps = []
+    for k in xrange(len(DAYS)):
+        bits = (mask >> (k * SLOTS_PER_DAY)) & DAY_SLOTS
+        if bits:
+            runs = bin(bits)[2:].rstrip("0").split("1")
+            gaps.extend(len(r) * SLOT_MINS for r in runs if r)
+    return gaps
+
+def gap_minutes(mask):
+    """Returns the total number of minutes of gaps between sections in mask."""
+    return SLOT_MINS * _gap_slots(mask)
+
+def score(mask, constraints=None):
+    """
+    Returns the score of a schedule with the given mask; lower is better. The
+    score is the minutes of gaps between sections, plus DAY_WEIGHT for every
+    day with classes, plus NON_PREFERRED_WEIGHT for every such day that is not
+    one of constraints.preferred_days.
+    """
+    return _day_score(mask_day_bits(mask), constraints) + gap_minutes(mask)
+
+def course_options(course, constraints=None):
+    """
+    Returns the list of conflict-free Options of course that are allowed by
+    constraints, grouped into lists of Options with the same mask.
+    """
+    groups = {}
+    for lec in course.lec_list:
+        lec_mask = section_mask(lec.days, lec.time_intv)
+        discs = [(None, 0)] if not lec.disc_list else \
+                [(disc, section_mask(disc.day, disc.time_intv)) for disc in lec.disc_list]
+        for disc, disc_mask in discs:
+            if lec_mask & disc_mask:
+                continue
+            option = Option(course, lec, disc, lec_mask | disc_mask)
+            if constraints is None or constraints.allows(option):
+                groups.setdefault(option.mask, []).append(option)
+    return sorted(groups.values(), key=lambda opts: opts[0].mask)
+
+def schedules(courses, constraints=None):
+    """
+    Generator that yields every conflict-free Schedule of courses (a list of
+    Courses) that meets constraints, in no particular order.
+    """
+    for mask, choices in _search(courses, constraints, None):
+        yield Schedule(choices, mask, score(mask, constraints))
+
+def best(courses, k=5, constraints=None):
+    """
+    Returns the list of (at most) k Schedules of courses with the lowest
+    scores that meet constraints, best first. Schedules with equal scores are
+    returned in the order they were found.
+    """
+    heap = []                   # Max-heap of the best k, as (-score, -seq, Schedule)
+    seq = [0]
+
+    def worst():
+        return -heap[0][0] if len(heap) >= k else None
+
+    for mask, choices in _search(courses, constraints, worst):
+        s = score(mask, constraints)
+        if len(heap) < k:
+            heapq.heappush(heap, (-s, -seq[0], Schedule(choices, mask, s)))
+        elif s < -heap[0][0]:
+            heapq.heapreplace(heap, (-s, -seq[0], Schedule(choices, mask, s)))
+        seq[0] += 1
+    return [entry[2] for entry in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+def _day_score(bits, constraints):
+    """
+    Returns the part of score() that depends only on the days with classes
+    (the 7-bit mask bits); it never decreases as sections are added.
+    """
+    s = DAY_WEIGHT * _popcount(bits)
+    if constraints is not None and constraints.preferred_days is not None:
+        s += NON_PREFERRED_WEIGHT * _popcount(bits & ~day_bits(constraints.preferred_days))
+    return s
+
+def _gap_slots(mask):
+    """Returns the number of free slots between sections in mask, on all days."""
+    span = 0
+    for k in xrange(len(DAYS)):
+        bits = (mask >> (k * SLOTS_PER_DAY)) & DAY_SLOTS
+        if bits:
+            span += bits.bit_length() - (bits & -bits).bit_length() + 1
+    return span - _popcount(mask)
+
+def _course_info(fits):
+    """
+    Returns (reach, least, common, spans) for fits, the choices of a course
+    that still fit: the mask of the slots that some choice takes, the fewest
+    slots that a choice takes, the bits of the days that every choice meets
+    on, and a list of (day index, low, high, fewest) for each of those days,
+    where every choice takes at least fewest slots of the day, the first at
+    or before low and the last at or after high - 1.
+    """
+    reach = 0
+    least = None
+    common = -1
+    for choice in fits:
+        reach |= choice[0]
+        common &= choice[1]
+        if least is None or choice[2] < least:
+            least = choice[2]
+    spans = []
+    for k in xrange(len(DAYS)):
+        if common >> k & 1:
+            day_spans = [span for choice in fits for span in choice[3] if span[0] == k]
+            spans.append((k, max(span[1] for span in day_spans),
+                          min(span[2] for span in day_spans), min(span[3] for span in day_spans)))
+    return reach, least, common, spans
+
+def _forced(courses, mask, bits, lo, hi, busy):
+    """
+    Returns (bits, lo, hi, need, day_need, reach) for the schedule mask, whose
+    days are bits and whose first slot, last slot + 1 and number of busy
+    slots on each day are lo, hi and busy, after adding what every choice of
+    the remaining courses adds: the days they all meet on, and on such a day
+    the span that they all extend it to and the fewest slots they take. need
+    and day_need are the fewest slots taken in all and on each day, and
+    reach is the mask of the slots that are or can be taken.
+
+    courses - list of (course index, choices, _course_info() of the choices)
+    """
+    lo = list(lo)
+    hi = list(hi)
+    need = sum(busy)
+    day_need = list(busy)
+    reach = mask
+    for i, fits, (course_reach, least, common, spans) in courses:
+        reach |= course_reach
+        need += least
+        bits |= common
+        for k, low, high, fewest in spans:
+            day_need[k] += fewest
+            # A day without slots only gets the span that all choices share
+            if lo[k] < hi[k] or low < high:
+                if low < lo[k]:
+                    lo[k] = low
+                if high > hi[k]:
+                    hi[k] = high
+    return bits, lo, hi, need, day_need, reach
+
+def _room(reach, need, day_need, busy):
+    """
+    Returns the list of the masks of the slots of each day in reach, or None
+    if reach has fewer slots than need, or fewer on some day than day_need
+    when that is more than busy (see _forced()).
+    """
+    if _popcount(reach) < need:
+        return None
+    day_reach = []
+    for k in xrange(len(DAYS)):
+        r = (reach >> (k * SLOTS_PER_DAY)) & DAY_SLOTS
+        if day_need[k] > busy[k] and _popcount(r) < day_need[k]:
+            return None
+        day_reach.append(r)
+    return day_reach
+
+def _fill(runs, lo, hi, day_reach):
+    """
+    Returns (filled, apart) for a choice with the given runs (see
+    day_runs()): the number of slots it takes inside the regions from lo to
+    hi on each day, and the number of slots that separate its runs outside a
+    region from the region and that no choice can take, so they are gaps.
+    Days with lo >= hi have no region.
+    """
+    filled = 0
+    apart = 0
+    for k, first, last in runs:
+        l = lo[k]
+        h = hi[k]
+        if l >= h:
+            continue
+        if first >= h:
+            x = (day_reach[k] & _LOW[first]).bit_length()
+            apart += first - (x if x > h else h)
+        elif last <= l:
+            x = day_reach[k] & _LOW[l] & ~_LOW[last]
+            apart += ((x & -x).bit_length() - 1 if x else l) - last
+        else:
+            filled += (last if last < h else h) - (first if first > l else l)
+    return filled, apart
+
+def _course_fill(fits, lo, hi, day_reach):
+    """
+    Returns (list of _fill() of each choice of fits, most filled, most
+    filled less apart, least apart) for the choices fits of a course.
+    """
+    fills = []
+    most = 0
+    most_net = None
+    least_apart = None
+    for choice in fits:
+        n, d = _fill(choice[4], lo, hi, day_reach)
+        fills.append((n, d))
+        if n > most:
+            most = n
+        if most_net is None or n - d > most_net:
+            most_net = n - d
+        if least_apart is None or d < least_apart:
+            least_apart = d
+    return fills, most, most_net, least_apart
+
+def _bound(courses, mask, bits, lo, hi, busy, day_scores):
+    """
+    Returns a list with the list of lower bounds on the score of every
+    schedule that extends mask by each choice of each course of courses, and
+    by one choice of each other course (see _forced(), which also describes
+    the other arguments); day_scores maps day bits to their _day_score().
+    Returns None if there is no such schedule because the remaining courses
+    need more slots than their choices can take together.
+
+    Spans only grow, so the free slots of the regions of _forced() stay gaps
+    unless a remaining course fills them. Each course fills at most the
+    slots of one of its choices there, and only slots that some choice can
+    take are filled at all. Choices outside a region add the gaps that
+    _fill() counts as apart. The other courses are counted with the most any
+    of their choices can fill.
+    """
+    bits, lo, hi, need, day_need, reach = _forced(courses, mask, bits, lo, hi, busy)
+    day_reach = _room(reach, need, day_need, busy)
+    if day_reach is None:
+        return None
+    gaps = 0                            # Free slots of the regions
+    fillable = 0                        # Those that some choice can take
+    for k in xrange(len(DAYS)):
+        if lo[k] < hi[k]:
+            gaps += hi[k] - lo[k] - busy[k]
+            fillable += _popcount(day_reach[k] & _LOW[hi[k]] & ~_LOW[lo[k]]) - busy[k]
+
+    terms = [_course_fill(fits, lo, hi, day_reach) for i, fits, info in courses]
+    most = sum(t[1] for t in terms)             # Most slots filled
+    most_net = sum(t[2] for t in terms)         # Most slots filled less the gaps made apart
+    apart = sum(t[3] for t in terms)            # Fewest gaps made apart
+
+    bounds = []
+    for (i, fits, info), (fills, c_most, c_net, c_apart) in zip(courses, terms):
+        other_most = most - c_most
+        other_net = most_net - c_net
+        other_apart = apart - c_apart
+        course_bounds = []
+        for choice, (n, d) in zip(fits, fills):
+            filled = other_most + n
+            gap_bound = gaps - (filled if filled < fillable else fillable) + other_apart + d
+            net_bound = gaps - other_net - n + d
+            course_bounds.append(day_scores[bits | choice[1]] +
+                                 SLOT_MINS * (gap_bound if gap_bound > net_bound else net_bound))
+        bounds.append(course_bounds)
+    return bounds
+
+def _popcount(n):
+    return bin(n).count("1")
+
+def _search(courses, constraints, worst):
+    """
+    Generator that yields (mask, list of Option lists in course order) for
+    every conflict-free schedule of courses that meets constraints.
+
+    worst - function that returns the score a schedule must beat to be
+            useful, or None if every schedule is; partial schedules that
+            cannot beat it are pruned, and the most promising choices are
+            tried first
+    """
+    # Each choice of a course is (mask, day bits, slots, spans, runs, Option list)
+    groups = [[(opts[0].mask, opts[0].day_bits, opts[0].slots, opts[0].spans,
+                day_runs(opts[0].mask), opts) for opts in course_options(c, constraints)]
+              for c in courses]
+    if any(not g for g in groups):
+        return
+    max_gap = None if constraints is None else constraints.max_gap
+    max_days = None if constraints is None else constraints.max_days
+    day_scores = [_day_score(bits, constraints) for bits in xrange(1 << len(DAYS))]
+    day_counts = [_popcount(bits) for bits in xrange(1 << len(DAYS))]
+    picked = [None] * len(courses)
+    n_days = len(DAYS)
+
+    def expand(fits_of, mask, bits, lo, hi, busy):
+        """
+        Returns (the choices of each course of fits_of that still fit and
+        can beat worst(), in the form of fits_of; index of the course with
+        the fewest; _bound() of its choices, or None if worst is None) for
+        the schedule mask, or None if some course has no choice left or the
+        courses cannot all fit.
+        """
+        rest = []
+        for i, fits, info in fits_of:
+            if info[0] & mask:          # Else every choice still fits
+                fits = [choice for choice in fits if not choice[0] & mask]
+                if not fits:
+                    return None
+                info = _course_info(fits)
+            rest.append((i, fits, info))
+        bounds = None
+        if worst is not None:
+            bounds = _bound(rest, mask, bits, lo, hi, busy, day_scores)
+            if bounds is None:
+                return None
+            w = worst()
+            if w is not None:
+                # Drop the choices that cannot beat w from every course
+                for c, (i, fits, info) in enumerate(rest):
+                    course_bounds = bounds[c]
+                    if max(course_bounds) >= w:
+                        keep = [x for x, b in enumerate(course_bounds) if b < w]
+                        if not keep:
+                            return None
+                        fits = [fits[x] for x in keep]
+                        rest[c] = (i, fits, _course_info(fits))
+                        bounds[c] = [course_bounds[x] for x in keep]
+        # Of the courses with the fewest choices, the one whose choices have
+        # the highest bounds is the most likely to fail
+        j = min(xrange(len(rest)),
+                key=lambda j: (len(rest[j][1]), -sum(bounds[j]) if bounds is not None else 0))
+        return rest, j, None if bounds is None else bounds[j]
+
+    def search(fits_of, mask, bits, lo, hi, busy, node):
+        """
+        Searches the schedules that extend mask by one choice of each course
+        of fits_of, a list of (course index, choices, _course_info() of the
+        choices); the schedule's days are bits, and its first slot, last
+        slot + 1 and number of busy slots on each day are lo, hi and busy.
+        node is expand() of the schedule, or None if it has not been
+        expanded yet.
+        """
+        if not fits_of:
+            if max_gap is None or all(g <= max_gap for g in day_gaps(mask)):
+                yield mask, list(picked)
+            return
+        if node is None:
+            node = expand(fits_of, mask, bits, lo, hi, busy)
+            if node is None:
+                return
+        rest, j, bounds = node
+
+        children = []
+        for c, (m, day_bits, slots, spans, runs, opts) in enumerate(rest[j][1]):
+            new_bits = bits | day_bits
+            if max_days is not None and day_counts[new_bits] > max_days:
+                continue
+            new_lo = list(lo)
+            new_hi = list(hi)
+            new_busy = list(busy)
+            for k, first, last, n in spans:
+                if first < new_lo[k]:
+                    new_lo[k] = first
+                if last > new_hi[k]:
+                    new_hi[k] = last
+                new_busy[k] += n
+            # [bound, index, Option list, mask, bits, lo, hi, busy, expand()]
+            children.append([0 if bounds is None else bounds[c], c, opts, mask | m, new_bits,
+                             new_lo, new_hi, new_busy, None])
+
+        i = rest[j][0]
+        rest = rest[:j] + rest[j + 1:]
+        if bounds is not None:
+            heapq.heapify(children)
+        while children:
+            if bounds is None:
+                child = children.pop(0)
+            else:
+                child = children[0]
+                w = worst()
+                if w is not None and child[0] >= w:
+                    break           # The other children have higher bounds
+                if rest and child[8] is None:
+                    # Expand the child before searching it, and put it back
+                    # with the lowest bound of its own choices if that is
+                    # higher, so that children whose bound is already too
+                    # high are never expanded
+                    child[8] = expand(rest, *child[3:8])
+                    if child[8] is None:
+                        heapq.heappop(children)
+                    elif min(child[8][2]) > child[0]:
+                        child[0] = min(child[8][2])
+                        heapq.heapreplace(children, child)
+                    continue
+                heapq.heappop(children)
+            picked[i] = child[2]
+            for result in search(rest, *(child[3:])):
+                yield result
+        picked[i] = None
+
+    fits_of = [(i, fits, _course_info(fits)) for i, fits in enumerate(groups)]
+    for result in search(fits_of, 0, 0, [SLOTS_PER_DAY] * n_days, [0] * n_days,
+                         [0] * n_days, None):
+        yield result
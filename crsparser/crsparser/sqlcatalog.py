@@ -0,0 +1,202 @@
+"""
+An optional query backend that keeps a parsed catalog in an indexed SQLite
+database on disk. The database is written once with SqlCatalog.build(), using
+the tables of crsparser.export, and can then be opened and queried by later
+processes without parsing the catalog again. The filters of crsparser.filter
+(and Queries from crsparser.query) are translated into SQL, so they run
+against the indexes instead of scanning every course in Python.
+"""
+
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+
+from crsparser.course import Department, Course, Lecture, Discussion
+import crsparser.export as export
+from crsparser.util.time import Time, TimeInterval
+
+# Indexes created by SqlCatalog.build(), as (table, columns) pairs
+INDEXES = [
+    ("departments", "name"),
+    ("courses", "dept_id"),
+    ("courses", "num"),
+    ("courses", "is_lab"),
+    ("courses", "is_upperdiv"),
+    ("courses", "duration"),
+    ("lectures", "course_id"),
+    ("lectures", "start_min, end_min"),
+    ("lectures", "end_min"),
+    ("lectures", "day_mask"),
+    ("discussions", "lecture_id")
+]
+
+# SQL condition on a course "c" for each filter in crsparser.filter; "?" is
+# replaced by the filter's argument (in minutes for times).
+_LECTURES_WHERE = "c.course_id IN (SELECT course_id FROM lectures WHERE {0})"
+FILTER_SQL = {
+    "duration_eq": "c.duration = ?",
+    "duration_ge": "c.duration >= ?",
+    "duration_le": "c.duration <= ?",
+    "islab": "c.is_lab = 1",
+    "isupperdiv": "c.is_upperdiv = 1",
+    "occurs_after": _LECTURES_WHERE.format("start_min >= ?"),
+    "occurs_before": _LECTURES_WHERE.format("end_min <= ?"),
+    "occurs_during": _LECTURES_WHERE.format("start_min >= ? AND end_min <= ?"),
+    "starts_at": _LECTURES_WHERE.format("start_min = ?"),
+    "ends_at": _LECTURES_WHERE.format("end_min = ?")
+}
+
+class SqlCatalog(object):
+    """A catalog stored in an SQLite database built by SqlCatalog.build()."""
+    def __init__(self, filename):
+        """
+        Opens the catalog database with the given filename.
+
+        filename - name of a database written by SqlCatalog.build()
+        """
+        self.filename = filename
+        self.conn = sqlite3.connect(filename)
+        self.conn.text_factory = str    # Same string type as the parser
+
+    @staticmethod
+    def build(filename, depts):
+        """
+        Writes the Departments in depts (any iterable, e.g. Parser.iter_catalog())
+        to the database filename, replacing any catalog already in it, creates
+        the indexes, and returns the opened SqlCatalog.
+        """
+        export.export_sqlite(depts, filename)
+        catalog = SqlCatalog(filename)
+        with catalog.conn:
+            for table, columns in INDEXES:
+                name = "idx_{0}_{1}".format(table, columns.replace(", ", "_"))
+                catalog.conn.execute("CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})"
+                                     .format(name, table, columns))
+            catalog.conn.execute("ANALYZE")
+        return catalog
+
+    def close(self):
+        self.conn.close()
+
+    def course_ids(self, fn_list=()):
+        """
+        Returns the ids (the course_id column) of the courses that meet every
+        criterion in fn_list, in catalog order.
+        """
+        where, params = where_clause(fn_list)
+        sql = "SELECT c.course_id FROM courses c WHERE {0} ORDER BY c.course_id".format(where)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def count(self, fn_list=()):
+        """Returns the number of courses that meet every criterion in fn_list."""
+        where, params = where_clause(fn_list)
+        sql = "SELECT COUNT(*) FROM courses c WHERE {0}".format(where)
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def departments(self, fn_list=()):
+        """
+        Returns the list of all Departments, each containing only its courses
+        that meet every criterion in fn_list, rebuilt from the database.
+        """
+        courses = {}
+        for dept_id, crs in self._iter_courses(fn_list):
+            courses.setdefault(dept_id, []).append(crs)
+
+        sql = "SELECT dept_id, name FROM departments ORDER BY dept_id"
+        return [Department(name, courses.get(dept_id, []))
+                for dept_id, name in self.conn.execute(sql)]
+
+    def _iter_courses(self, fn_list):
+        """
+        Generator that yields (dept_id, Course) for every course meeting the
+        criteria in fn_list, with its lectures and discussions.
+        """
+        where, params = where_clause(fn_list)
+        selected = "SELECT c.course_id FROM courses c WHERE " + where
+
+        lec_cols = ", ".join('"{0}"'.format(f) for f in export.TABLES["lectures"])
+        lec_rows = self.conn.execute(
+            "SELECT {0} FROM lectures WHERE course_id IN ({1}) ORDER BY lecture_id"
+            .format(lec_cols, selected), params)
+        lec_groups = groupby(lec_rows, itemgetter(1))
+
+        discs = {}
+        disc_rows = self.conn.execute(
+            "SELECT lecture_id, name, day, start_min, end_min, ta_name FROM discussions "
+            "WHERE lecture_id IN (SELECT lecture_id FROM lectures WHERE course_id IN ({0})) "
+            "ORDER BY discussion_id".format(selected), params)
+        for lecture_id, name, day, start, end, ta_name in disc_rows:
+            discs.setdefault(lecture_id, []).append(
+                Discussion(name, day, ta_name, _intv(start, end)))
+
+        crs_rows = self.conn.execute(
+            "SELECT c.course_id, c.dept_id, c.number, c.name FROM courses c "
+            "WHERE {0} ORDER BY c.course_id".format(where), params)
+        group_id, group = next(lec_groups, (None, None))
+        for course_id, dept_id, number, name in crs_rows:
+            lec_list = []
+            if group_id == course_id:
+                lec_list = [_lecture(row, discs) for row in group]
+                group_id, group = next(lec_groups, (None, None))
+            yield dept_id, Course(name, number, lec_list)
+
+def where_clause(fn_list):
+    """
+    Returns (SQL condition on the courses table aliased as "c", parameters)
+    selecting the courses that meet every criterion in fn_list. Raises a
+    ValueError for functions that cannot be translated into SQL.
+    """
+    if not fn_list:
+        return "1", []
+    parts = []
+    params = []
+    for fn in fn_list:
+        sql, fn_params = filter_sql(fn)
+        parts.append(sql)
+        params.extend(fn_params)
+    return " AND ".join(parts), params
+
+def filter_sql(fn):
+    """
+    Returns (SQL condition, parameters) for one filter from crsparser.filter or
+    a crsparser.query.Query.
+    """
+    name = getattr(fn, "filter_name", None)
+    if name == "query":
+        return _node_sql(fn.tree)
+    elif name not in FILTER_SQL:
+        raise ValueError("Filter cannot be translated into SQL: {0!r}".format(fn))
+
+    arg = fn.filter_arg
+    if arg is None:
+        params = []
+    elif isinstance(arg, Time):
+        params = [arg.minutes()]
+    elif isinstance(arg, TimeInterval):
+        params = [arg.start.minutes(), arg.end.minutes()]
+    else:
+        params = [arg]
+    return "(" + FILTER_SQL[name] + ")", params
+
+def _node_sql(node):
+    """Returns (SQL condition, parameters) for a crsparser.query parse tree node."""
+    kind = node[0]
+    if kind in ("and", "or"):
+        left, left_params = _node_sql(node[1])
+        right, right_params = _node_sql(node[2])
+        return ("({0} {1} {2})".format(left, kind.upper(), right),
+                left_params + right_params)
+    elif kind == "not":
+        sql, params = _node_sql(node[1])
+        return "(NOT {0})".format(sql), params
+    return filter_sql(node[1])
+
+def _intv(start, end):
+    return TimeInterval(Time.from_minutes(start), Time.from_minutes(end))
+
+def _lecture(row, discs):
+    """Returns the Lecture for a row of the lectures table."""
+    fields = dict(zip(export.TABLES["lectures"], row))
+    return Lecture(fields["number"], fields["days"], fields["prof_name"],
+                   _intv(fields["start_min"], fields["end_min"]), fields,
+                   discs.get(fields["lecture_id"], []))
@@ -0,0 +1,131 @@
+"""
+Optional instrumentation of the parser and the filters: counters, and timers
+that record the number of calls, wall time and CPU time of each stage. Stats
+are disabled by default. The parser and the filters check the module flag
+`enabled` once per department, course or filter chain, and only then replace
+their regex functions, constructors and filters by timed wrappers (see
+timed()), so disabled stats add no work per line or per course.
+
+Stats are kept per process: when the catalog is parsed by several worker
+processes, only the stages run in the main process are recorded.
+"""
+
+import time
+
+# Whether stats are recorded; use enable() and disable() to change it
+enabled = False
+
+_counters = {}          # Name -> count
+_timers = {}            # Name -> [calls, hits, wall seconds, CPU seconds]
+
+# 0 = name, 1 = calls, 2 = hits, 3 = wall time (ms), 4 = CPU time (ms),
+# 5 = wall time per call (us)
+TIMER_FSTR = "{0:<40} {1:>9} {2:>9} {3:>10.1f} {4:>10.1f} {5:>9.2f}"
+TIMER_HEADER = "{0:<40} {1:>9} {2:>9} {3:>10} {4:>10} {5:>9}".format(
+    "Stage", "Calls", "Hits", "Wall(ms)", "CPU(ms)", "Per(us)")
+COUNTER_FSTR = "{0:<40} {1:>9}"
+
+def enable():
+    """Starts recording stats."""
+    global enabled
+    enabled = True
+
+def disable():
+    """Stops recording stats; the stats recorded so far are kept."""
+    global enabled
+    enabled = False
+
+def reset():
+    """Discards all recorded stats."""
+    _counters.clear()
+    _timers.clear()
+
+def incr(name, n=1):
+    """Adds n to the counter with the given name, if stats are enabled."""
+    if enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+def timer(name):
+    """
+    Returns a context manager that adds the time spent in its block to the
+    timer with the given name, if stats are enabled, e.g.
+
+        with stats.timer("catalog.index"):
+            ...
+    """
+    if enabled:
+        return _Timer(name)
+    return _NULL_TIMER
+
+def timed(name, fn):
+    """
+    Returns a function that calls fn and records each call in the timer with
+    the given name; calls whose result is true (e.g. a regex match) are also
+    counted as hits. The calls are recorded even if stats are disabled, so
+    callers use the wrapper only if stats are enabled.
+    """
+    def wrapper(*args, **kwargs):
+        wall = time.time()
+        cpu = time.clock()
+        result = fn(*args, **kwargs)
+        _add(name, time.time() - wall, time.clock() - cpu, 1 if result else 0)
+        return result
+    return wrapper
+
+def counters():
+    """Returns a dict mapping the name of each counter to its count."""
+    return dict(_counters)
+
+def timers():
+    """
+    Returns a dict mapping the name of each timer to a dict with the keys
+    "calls", "hits", "wall" and "cpu" (times in seconds).
+    """
+    return dict((name, dict(zip(("calls", "hits", "wall", "cpu"), t)))
+                for name, t in _timers.iteritems())
+
+def report():
+    """Returns a table of all timers and counters, sorted by name."""
+    lines = [TIMER_HEADER]
+    for name in sorted(_timers):
+        calls, hits, wall, cpu = _timers[name]
+        lines.append(TIMER_FSTR.format(name, calls, hits, wall * 1e3, cpu * 1e3,
+                                       wall * 1e6 / calls if calls else 0.0))
+    if _counters:
+        lines.append("")
+        for name in sorted(_counters):
+            lines.append(COUNTER_FSTR.format(name, _counters[name]))
+    return "\n".join(lines)
+
+def _add(name, wall, cpu, hits=0):
+    t = _timers.get(name)
+    if t is None:
+        t = _timers[name] = [0, 0, 0.0, 0.0]
+    t[0] += 1
+    t[1] += hits
+    t[2] += wall
+    t[3] += cpu
+
+class _Timer(object):
+    """Context manager returned by timer() when stats are enabled."""
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.cpu = time.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        _add(self.name, time.time() - self.wall, time.clock() - self.cpu)
+        return False
+
+class _NullTimer(object):
+    """Context manager returned by timer() when stats are disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
@@ -0,0 +1,230 @@
+"""
+A generator of synthetic course catalogs in the registrar's text format, as
+read by Parser (see Parser.COURSE_TITLE_REGEX and Parser.COURSE_LEC_REGEX).
+Catalogs are random but repeatable: the same options and seed always give the
+same text. Besides well-formed courses, a fraction of the generated lines are
+irregular, as in real listings: page headers and other noise, blank lines,
+"SAME AS:" and "RESTRICT:" lines, lectures without a location or professor,
+dashes instead of a lecture id, and departments that are listed in the
+department file but missing from the catalog.
+
+Run `python -m crsparser.synthetic -h` from the root project directory for
+usage.
+"""
+
+import argparse
+import random
+
+# Words used for department and course names
+WORDS = ["ADVANCED", "ALGEBRA", "ANALYSIS", "ANCIENT", "APPLIED", "ART", "BIOLOGY",
+         "CHEMISTRY", "CINEMA", "CLASSICAL", "COMPUTATION", "DESIGN", "DYNAMICS",
+         "ECONOMICS", "ENGINEERING", "ETHICS", "EVOLUTION", "FIELD", "FOUNDATIONS",
+         "GEOLOGY", "HISTORY", "HUMAN", "INTRODUCTION", "LANGUAGE", "LAW", "LITERATURE",
+         "MECHANICS", "METHODS", "MODERN", "MUSIC", "NETWORKS", "OPTICS", "PHILOSOPHY",
+         "PHYSICS", "POLITICS", "PRINCIPLES", "SEMINAR", "SOCIETY", "STATISTICS",
+         "STUDIES", "SYSTEMS", "THEORY", "TOPICS", "WORLD", "WRITING"]
+PROF_NAMES = ["ADAMS", "BROWN", "CHEN", "DAVIS", "EGGERT", "GARCIA", "HAINES", "KIM",
+              "LOPEZ", "MILLER", "NGUYEN", "PATEL", "ROLFE", "SMITH", "TAO", "WANG"]
+BUILDINGS = ["BOELTER", "DODD", "FRANZ", "HAINES", "KINSEY", "MOORE", "MS", "ROLFE",
+             "ROYCE", "SCHOENBERG"]
+NOISE_LINES = ["SCHEDULE OF CLASSES",
+               "COURSE TITLE IS CLASS ID TYPE SEC DAYS TIME LOCATION INSTRUCTOR "
+               "ENRL CP XC GRD UNITS",
+               "Page {0}",
+               "*** CLASS CANCELLED ***",
+               "SEE DEPARTMENT FOR DETAILS"]
+
+DAYS = ["MWF", "MW", "TR", "MTWRF", "M", "T", "W", "R", "F"]
+CLASS_TYPES = ["LEC", "LEC", "LEC", "SEM", "LAB"]
+GRADE_TYPES = ["LG", "LG", "SO", "PN"]
+DURATIONS = [50, 50, 75, 110, 170]      # Lengths of lectures in minutes
+PREFIXES = ["", "", "", "", "M", "C", "CM"]
+SUFFIXES = ["", "", "", "A", "B", "C", "L"]
+MAX_NUMBER = 299
+MAX_COURSES = len(set(PREFIXES)) * MAX_NUMBER * len(set(SUFFIXES))   # Per department
+
+class Options(object):
+    """Sizes and proportions of a generated catalog."""
+    def __init__(self, depts=20, courses=50, lectures=(1, 3), discussions=(0, 3),
+                 irregular=0.05, missing_depts=1, seed=0):
+        """
+        Arguments:
+
+        depts - number of departments in the catalog
+        courses - number of courses per department
+        lectures - (min, max) number of lectures per course
+        discussions - (min, max) number of discussions per lecture
+        irregular - probability of each kind of irregular line at each place
+                    where it may appear
+        missing_depts - number of departments that are listed in the department
+                        list but have no lines in the catalog
+        seed - seed of the random number generator
+        """
+        self.depts = depts
+        self.courses = courses
+        self.lectures = lectures
+        self.discussions = discussions
+        self.irregular = irregular
+        self.missing_depts = missing_depts
+        self.seed = seed
+
+class Counts(object):
+    """The numbers of items written by generate()."""
+    def __init__(self):
+        self.depts = 0
+        self.courses = 0
+        self.lectures = 0
+        self.discussions = 0
+        self.lines = 0
+
+    def as_dict(self):
+        return {"depts": self.depts, "courses": self.courses, "lectures": self.lectures,
+                "discussions": self.discussions, "lines": self.lines}
+
+def dept_names(n, rnd):
+    """Returns a sorted list of n distinct department names."""
+    names = set()
+    while len(names) < n:
+        names.add(" ".join(rnd.sample(WORDS, rnd.choice((1, 2, 2, 3)))))
+    return sorted(names)
+
+def generate(out, options=None):
+    """
+    Writes a catalog to the file object out and returns (list of department
+    names, in the order Parser.load_dept_list() expects, Counts of what was
+    written). The department list includes the missing departments.
+    """
+    if options is None:
+        options = Options()
+    if options.courses > MAX_COURSES:
+        raise ValueError("At most {0} courses per department".format(MAX_COURSES))
+    rnd = random.Random(options.seed)
+    names = dept_names(options.depts + options.missing_depts, rnd)
+    missing = set(rnd.sample(names, options.missing_depts))
+    counts = Counts()
+
+    def write(line):
+        out.write(line + "\n")
+        counts.lines += 1
+
+    class_id = [100000000]              # Next class id (in a list to update it)
+
+    def next_id():
+        class_id[0] += rnd.randint(1, 20)
+        s = str(class_id[0])
+        return s[0:3] + "-" + s[3:6] + "-" + s[6:9]
+
+    for name in names:
+        if name in missing:
+            continue
+        counts.depts += 1
+        write(name)
+        if rnd.random() < options.irregular * 4:
+            write(rnd.choice(NOISE_LINES).format(counts.lines))
+
+        numbers = set()
+        for _ in xrange(options.courses):
+            number = _course_number(rnd, numbers)
+            course_name = " ".join(rnd.choice(WORDS) for _ in xrange(rnd.randint(1, 4)))
+            n_lecs = rnd.randint(*options.lectures)
+            counts.courses += 1
+
+            for lec_num in xrange(1, n_lecs + 1):
+                lec = _section(rnd, next_id(), str(lec_num), rnd.choice(CLASS_TYPES),
+                               rnd.choice(DAYS), options.irregular)
+                if lec_num == 1:
+                    write("{0} {1} {2} {3}".format(number, course_name,
+                                                   rnd.choice("YN"), lec))
+                else:
+                    write("  N " + lec)
+                counts.lectures += 1
+
+                for d in xrange(rnd.randint(*options.discussions)):
+                    write("  N " + _section(rnd, next_id(), str(lec_num) + "ABCDEFGH"[d],
+                                            "DIS", rnd.choice("MTWRF"), options.irregular))
+                    counts.discussions += 1
+
+            if rnd.random() < options.irregular:
+                write("SAME AS: {0} {1}".format(rnd.choice(names), number))
+            if rnd.random() < options.irregular:
+                write("RESTRICT: {0} MAJORS ONLY".format(name))
+            if rnd.random() < options.irregular:
+                write(rnd.choice(["", rnd.choice(NOISE_LINES).format(counts.lines)]))
+    return names, counts
+
+def write_catalog(dept_file, data_file, options=None):
+    """
+    Writes a catalog to data_file and its list of departments to dept_file.
+    Returns the Counts of generate().
+    """
+    with open(data_file, "w") as out:
+        names, counts = generate(out, options)
+    with open(dept_file, "w") as f:
+        for name in names:
+            f.write(name + "\n")
+    return counts
+
+def _course_number(rnd, numbers):
+    """Returns a new course number (not in the set numbers), e.g. "M51A"."""
+    while True:
+        number = "{0}{1}{2}".format(rnd.choice(PREFIXES), rnd.randint(1, MAX_NUMBER),
+                                    rnd.choice(SUFFIXES))
+        if number not in numbers:
+            numbers.add(number)
+            return number
+
+def _section(rnd, class_id, sec_num, class_type, days, irregular):
+    """
+    Returns the part of a lecture or discussion line from the class id on,
+    e.g. "187-093-200 LEC 1 MW 10:00-11:50a BOELTER 3400 SMITH, J. 200 05 LG 4.0".
+    """
+    start = rnd.randint(8 * 2, 19 * 2) * 30             # 8:00 to 19:30
+    end = start + rnd.choice(DURATIONS)
+    parts = [class_id if rnd.random() >= irregular else "-" * rnd.randint(1, 6),
+             class_type, sec_num, days, _time(start, False) + "-" + _time(end, True)]
+    if rnd.random() >= irregular:
+        parts.append("{0} {1}{2}".format(rnd.choice(BUILDINGS), rnd.randint(1, 5999),
+                                         rnd.choice(["", "", "", "A"])))
+    if rnd.random() >= irregular:
+        parts.append("{0}, {1}.".format(rnd.choice(PROF_NAMES), rnd.choice(WORDS)[0]))
+    parts.append("{0} {1:02d} {2} {3}.0".format(rnd.randint(5, 400), rnd.randint(0, 99),
+                                                rnd.choice(GRADE_TYPES), rnd.randint(1, 6)))
+    return " ".join(parts)
+
+def _time(mins, suffix):
+    """
+    Returns the time mins minutes after midnight on a 12 hour clock, e.g.
+    "1:50p" (with suffix) or "1:50" (without; the parser assumes pm before 8).
+    """
+    h = mins // 60 % 24
+    s = "{0}:{1:02d}".format((h - 1) % 12 + 1, mins % 60)
+    if suffix:
+        s += "a" if h < 12 else "p"
+    return s
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic course catalog.")
+    ap.add_argument("dept_file", help="file to write the list of departments to")
+    ap.add_argument("data_file", help="file to write the catalog data to")
+    ap.add_argument("--depts", type=int, default=20, help="number of departments")
+    ap.add_argument("--courses", type=int, default=50,
+                    help="number of courses per department")
+    ap.add_argument("--lectures", type=int, nargs=2, default=[1, 3], metavar=("MIN", "MAX"),
+                    help="number of lectures per course")
+    ap.add_argument("--discussions", type=int, nargs=2, default=[0, 3], metavar=("MIN", "MAX"),
+                    help="number of discussions per lecture")
+    ap.add_argument("--irregular", type=float, default=0.05,
+                    help="probability of each kind of irregular line")
+    ap.add_argument("--missing-depts", type=int, default=1,
+                    help="number of listed departments missing from the catalog")
+    ap.add_argument("--seed", type=int, default=0, help="random seed")
+    args = ap.parse_args()
+
+    counts = write_catalog(args.dept_file, args.data_file, Options(
+        args.depts, args.courses, tuple(args.lectures), tuple(args.discussions),
+        args.irregular, args.missing_depts, args.seed))
+    print "Wrote {depts} department(s), {courses} course(s), {lectures} lecture(s), " \
+          "{discussions} discussion(s) in {lines} line(s)".format(**counts.as_dict())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+A store of the catalogs of several terms (e.g. quarters) at once. Catalogs of
+different terms repeat most of their course names, numbers, professors,
+locations and meeting times, so when a term is added, every string and
+number in it is replaced by an equal value already held by the store, if
+there is one. Each distinct value is then kept once for all terms. Meeting
+times need no sharing: TimeIntervals are interned by their start, end and
+alignment when they are created (see crsparser.util.time).
+
+Filters (see crsparser.filter) run over any chosen set of terms; each term
+has its own ColumnStore and FilterCache, built on first use.
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+
+import crsparser.bitset as bitset
+import crsparser.cache as cache
+from crsparser.columnar import ColumnStore
+from crsparser.util.memory import deep_sizeof
+
+# 0 = term, 1 = courses, 2 = bytes if loaded separately
+TERM_FSTR = "{0:<20} {1:>9} {2:>14}"
+TERM_HEADER = "{0:<20} {1:>9} {2:>14}".format("Term", "Courses", "Bytes alone")
+
+class Term(object):
+    """The catalog of one term in a TermStore."""
+    def __init__(self, name, depts):
+        """
+        Arguments:
+
+        name - name of the term, e.g. "Fall 2014"
+        depts - list of Departments of the term's catalog
+        """
+        self.name = name
+        self.depts = depts
+        self._store = None
+        self._cache = None
+
+    @property
+    def store(self):
+        """The ColumnStore of the term, built on first access."""
+        if self._store is None:
+            self._store = ColumnStore(self.depts)
+        return self._store
+
+    @property
+    def cache(self):
+        """The FilterCache of the term, built on first access."""
+        if self._cache is None:
+            self._cache = bitset.FilterCache(self.store)
+        return self._cache
+
+    def dept_of(self, i):
+        """Returns the Department of course i of the term's ColumnStore."""
+        return self.depts[bisect_right(self.store.dept_offsets, i) - 1]
+
+class TermStore(object):
+    """The catalogs of several terms, sharing their equal values."""
+    def __init__(self):
+        self._terms = OrderedDict()     # Term name -> Term, in order of addition
+        self._values = {}               # Value -> the instance shared by all terms
+        self.shared = 0                 # Number of values replaced by a shared one
+
+    def add(self, name, depts):
+        """
+        Adds the Departments depts as the term with the given name, replacing
+        any term of the same name, and returns the Term. The values in depts
+        are replaced by equal values of the other terms in place.
+        """
+        for d in depts:
+            self._share_dept(d)
+        term = self._terms[name] = Term(name, depts)
+        return term
+
+    def load(self, name, parser, data_file, use_cache=True):
+        """
+        Parses data_file (or loads its snapshot, if use_cache is true; see
+        crsparser.cache) with parser, and adds it as the term with the given
+        name. Returns the Term.
+        """
+        if use_cache:
+            depts = cache.load_catalog(parser, data_file)
+        else:
+            depts = parser.parse_catalog(data_file)
+        return self.add(name, depts)
+
+    def remove(self, name):
+        """
+        Removes the term with the given name. Values shared with the removed
+        term stay in the store until clear() is called.
+        """
+        del self._terms[name]
+
+    def clear(self):
+        """Removes every term and every shared value."""
+        self._terms.clear()
+        self._values.clear()
+        self.shared = 0
+
+    def terms(self):
+        """Returns the list of the names of the terms, in order of addition."""
+        return list(self._terms)
+
+    def __getitem__(self, name):
+        """Returns the Term with the given name."""
+        return self._terms[name]
+
+    def __len__(self):
+        """Returns the number of terms."""
+        return len(self._terms)
+
+    def filter(self, fn_list, terms=None):
+        """
+        Returns an OrderedDict mapping the name of each term in terms (a list
+        of names, or None for every term) to the bitset of its courses that
+        meet every criterion in fn_list (see crsparser.bitset).
+        """
+        names = self.terms() if terms is None else terms
+        return OrderedDict((name, self._terms[name].cache.all_of(fn_list))
+                           for name in names)
+
+    def iter_selected(self, fn_list, terms=None):
+        """
+        Generator that yields (term name, Department, Course) for every course
+        of the given terms that meets every criterion in fn_list (see
+        filter()), in term order and then in catalog order.
+        """
+        for name, bits in self.filter(fn_list, terms).iteritems():
+            term = self._terms[name]
+            courses = term.store.courses
+            mask = bytes(bitset.to_mask(bits, len(courses)))
+            i = mask.find("\x01")
+            while i >= 0:
+                yield name, term.dept_of(i), courses[i]
+                i = mask.find("\x01", i + 1)
+
+    def memory_report(self):
+        """
+        Returns a MemoryReport of the terms, comparing the memory they use in
+        the store with the memory each would use if it were loaded alone. A
+        term alone is measured with the values it shares within itself, so
+        the bytes saved are a lower bound.
+        """
+        report = MemoryReport()
+        for name, term in self._terms.iteritems():
+            report.terms.append((name, sum(len(d.courses) for d in term.depts),
+                                 deep_sizeof(term.depts, set())))
+        report.combined = deep_sizeof([t.depts for t in self._terms.itervalues()], set())
+        report.values = len(self._values)
+        report.shared = self.shared
+        return report
+
+    def _share(self, value):
+        """Returns the instance of value shared by all terms."""
+        if value is None:
+            return None
+        shared = self._values.setdefault(value, value)
+        if shared is not value:
+            self.shared += 1
+        return shared
+
+    def _share_dept(self, d):
+        share = self._share
+        d.name = share(d.name)
+        for c in d.courses:
+            c.name = share(c.name)
+            c.number = share(c.number)
+            c.num = share(c.num)
+            for lec in c.lec_list:
+                lec.number = share(lec.number)
+                lec.days = share(lec.days)
+                lec.prof_name = share(lec.prof_name)
+                lec.loc = share(lec.loc)
+                lec.capacity = share(lec.capacity)
+                lec.xc = share(lec.xc)
+                lec.grade_type = share(lec.grade_type)
+                lec.units = share(lec.units)
+                lec.same_as = share(lec.same_as)
+                lec.restrict = share(lec.restrict)
+                for disc in lec.disc_list:
+                    disc.name = share(disc.name)
+                    disc.day = share(disc.day)
+                    disc.ta_name = share(disc.ta_name)
+
+class MemoryReport(object):
+    """The memory used by the terms of a TermStore, returned by memory_report()."""
+    def __init__(self):
+        self.terms = []         # List of (term name, courses, bytes if loaded alone)
+        self.combined = 0       # Bytes used by all terms together
+        self.values = 0         # Number of distinct values held by the store
+        self.shared = 0         # Number of values replaced by a shared one
+
+    def separate(self):
+        """Returns the total bytes the terms would use if each were loaded alone."""
+        return sum(size for _, _, size in self.terms)
+
+    def saved(self):
+        """Returns the bytes saved by sharing values across terms."""
+        return self.separate() - self.combined
+
+    def ratio(self):
+        """
+        Returns the sharing ratio, the bytes of the terms loaded separately
+        divided by the bytes of the terms in the store (1.0 if nothing is shared).
+        """
+        return float(self.separate()) / self.combined if self.combined else 1.0
+
+    def __str__(self):
+        """Returns a table of the terms, followed by the totals."""
+        lines = [TERM_HEADER]
+        for name, courses, size in self.terms:
+            lines.append(TERM_FSTR.format(name, courses, size))
+        lines.append("")
+        lines.append("Separately:    {0:14d} bytes".format(self.separate()))
+        lines.append("Combined:      {0:14d} bytes".format(self.combined))
+        lines.append("Saved:         {0:14d} bytes".format(self.saved()))
+        lines.append("Sharing ratio: {0:14.2f}".format(self.ratio()))
+        lines.append("Distinct values: {0:12d} ({1} duplicates dropped)".format(
+            self.values, self.shared))
+        return "\n".join(lines)
@@ -0,0 +1,30 @@
+"""
+Measures the memory used by graphs of objects.
+"""
+
+import sys
+
+def deep_sizeof(obj, seen):
+    """
+    Returns the number of bytes used by obj and every object reachable from it
+    (through containers, __dict__ and __slots__) that is not yet in seen, a
+    set of object ids; interned and shared objects are only counted once.
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.iteritems():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(obj.__dict__, seen)
+    for cls in type(obj).__mro__:
+        for slot in cls.__dict__.get("__slots__", ()):
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+    return size
@@ -1,10 +1,14 @@
 import re
-import crsparser.util.utils as utils
 
 class TimeInterval(object):
-    """A time interval, consisting of a start time and an end time."""
+    """
+    A time interval, consisting of a start time and an end time. TimeIntervals
+    are immutable and interned: constructing an interval that exists already
+    returns the existing instance.
+    """
+    __slots__ = ("start", "end", "align")
 
-    def __init__(self, start, end, align=True):
+    def __new__(cls, start, end, align=True):
         """
         Arguments:
 
@@ -14,17 +18,41 @@ class TimeInterval(object):
         align - whether str(self) will return an aligned version of the interval,
                 e.g. " 7:00- 8:00" will align vertically with "10:00-14:50"
         """
-        if isinstance(start, Time) and isinstance(end, Time):
-            self.start = start
-            self.end = end
-            self.align = align
-        elif isinstance(start, str) and isinstance(end, str):
-            self.start = Time(start)
-            self.end = Time(end)
-            self.align = align
-        else:
+        if isinstance(start, str) and isinstance(end, str):
+            start = Time(start)
+            end = Time(end)
+        elif not isinstance(start, Time) or not isinstance(end, Time):
             raise TypeError("Invalid types (must be a pair of strings or Times)")
 
+        key = (start._mins, end._mins, bool(align))
+        intv = _INTERVALS.get(key)
+        if intv is None:
+            intv = object.__new__(cls)
+            object.__setattr__(intv, "start", start)
+            object.__setattr__(intv, "end", end)
+            object.__setattr__(intv, "align", key[2])
+            _INTERVALS[key] = intv
+        return intv
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TimeInterval objects are immutable")
+
+    def __reduce__(self):
+        """Unpickles to the interned instance."""
+        return (TimeInterval, (self.start, self.end, self.align))
+
+    def __eq__(self, other):
+        """Returns true if the two intervals have the same start and end times."""
+        return (isinstance(other, TimeInterval) and self.start._mins == other.start._mins and
+                self.end._mins == other.end._mins)
+
+    def __ne__(self, other):
+        """Returns true if the two intervals are not equal, and false otherwise."""
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.start._mins, self.end._mins))
+
     def __str__(self):
         """
         Concatenates str(self.start), "-", and str(self.end). Note that if
@@ -67,82 +95,143 @@ class Time(object):
     TIME_FSTR = "{0:>2d}:{1:02d}"
     MINS_PER_DAY = 1440
 
-    def __init__(self, time):
+    # Stored as a single int, the number of minutes since midnight
+    __slots__ = ("_mins",)
+
+    def __new__(cls, time):
         """
         Converts the string time to a 24-hour time. Does not check minutes
         for validity, so 5:74 is the same as 6:14. However, does convert all
         hours to a number between 0 and 23 and minutes to a number between
-        0 and 59.
+        0 and 59. Returns the interned Time of that minute of the day.
 
         time - a string representing the time, such as "7:00"; the format is
                "hh:mm" with an optional "a|am|p|pm";
         """
-        r = re.match(Time.TIME_REGEX, time)
-        if r is not None:
-            hours = r.group(1)
-            mins = r.group(2)
-            pm = 0                  # Convert from pm to 24 hour time
-            if r.group(3) != None:
-                if "p" in r.group(3).lower() and hours != "12":
-                    pm = 1
-                if "a" in r.group(3).lower() and hours == "12":
-                    hours = 0
-
-            if utils.isint(hours) and utils.isint(mins):
-                self.hours = (int(hours) + int(mins) / 60 + 12 * pm) % 24
-                self.mins = int(mins) % 60
-            else:
-                raise ValueError("Invalid time format")
-        else:
-            raise ValueError("Invalid time format")
+        t = _BY_TEXT.get(time)
+        if t is None:
+            t = _TIMES[_parse(time) % Time.MINS_PER_DAY]
+            if len(_BY_TEXT) < _MAX_TEXTS:
+                _BY_TEXT[time] = t
+        return t
+
+    @staticmethod
+    def from_minutes(mins):
+        """Returns the Time that is mins minutes after midnight."""
+        return _TIMES[mins % Time.MINS_PER_DAY]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Time objects are immutable")
+
+    def __reduce__(self):
+        """Unpickles to the interned instance."""
+        return (_time_at, (self._mins,))
+
+    @property
+    def hours(self):
+        """The hours of this time, from 0 to 23."""
+        return self._mins // 60
+
+    @property
+    def mins(self):
+        """The minutes of this time, from 0 to 59."""
+        return self._mins % 60
+
+    def minutes(self):
+        """Returns the number of minutes since midnight."""
+        return self._mins
 
     def __eq__(self, other):
         """Returns true if the two times are equal, and false otherwise."""
-        if (self.hours * 60 + self.mins) == (other.hours * 60 + other.mins):
-            return True
-        else:
-            return False
+        return isinstance(other, Time) and self._mins == other._mins
+
+    def __ne__(self, other):
+        """Returns true if the two times are not equal, and false otherwise."""
+        return not self == other
+
+    def __hash__(self):
+        return self._mins
 
     def __ge__(self, other):
         """Returns true if self is after or the same time as other, and false otherwise."""
-        if (self.hours * 60 + self.mins) >= (other.hours * 60 + other.mins):
-            return True
-        else:
-            return False
+        return self._mins >= other._mins
 
     def __gt__(self, other):
         """Returns true if self is after other, and false otherwise."""
-        if (self.hours * 60 + self.mins) > (other.hours * 60 + other.mins):
-            return True
-        else:
-            return False
+        return self._mins > other._mins
 
     def __le__(self, other):
         """Returns true if self is before or the same time as other, and false otherwise."""
-        if (self.hours * 60 + self.mins) <= (other.hours * 60 + other.mins):
-            return True
-        else:
-            return False
+        return self._mins <= other._mins
 
     def __lt__(self, other):
         """Returns true if self is before other, and false otherwise."""
-        if (self.hours * 60 + self.mins) < (other.hours * 60 + other.mins):
-            return True
-        else:
-            return False
+        return self._mins < other._mins
 
     def __sub__(self, start):
         """
         Returns the difference self - start in minutes. Assumes that
         if start is after self on the clock, the duration passes midnight.
         """
-        mins1 = self.hours * 60 + self.mins
-        mins2 = start.hours * 60 + start.mins
-        if mins1 >= mins2:
-            return mins1 - mins2
+        if self._mins >= start._mins:
+            return self._mins - start._mins
         else:                       # Passing midnight
-            return Time.MINS_PER_DAY - mins2 + mins1
+            return Time.MINS_PER_DAY - start._mins + self._mins
 
     def __str__(self):
         """Returns the time hh:mm; the hours are padded with one space if h < 10."""
-        return Time.TIME_FSTR.format(self.hours, self.mins)
+        return _TIME_STRS[self._mins]
+
+def _parse(time):
+    """
+    Returns the number of minutes since midnight (possibly 1440 or more) of
+    the string time, as described for Time(). Parses the common forms "h:mm"
+    and "hh:mm", with an optional "a" or "p" right after the minutes, without
+    a regex; other forms are matched with Time.TIME_REGEX.
+    """
+    i = time.find(":")
+    if i == 1 or i == 2:
+        hours = time[:i]
+        mins = time[i + 1:i + 3]
+        rest = time[i + 3:i + 4]
+        if hours.isdigit() and len(mins) == 2 and mins.isdigit() and rest in _SUFFIXES:
+            h = int(hours)
+            if (rest == "p" or rest == "P") and h != 12:
+                h += 12
+            elif (rest == "a" or rest == "A") and h == 12:
+                h = 0
+            return h * 60 + int(mins)
+
+    r = re.match(Time.TIME_REGEX, time)
+    if r is None:
+        raise ValueError("Invalid time format")
+    h = int(r.group(1))
+    if r.group(3) is not None:
+        if r.group(3) in "pP" and h != 12:
+            h += 12
+        elif r.group(3) in "aA" and h == 12:
+            h = 0
+    return h * 60 + int(r.group(2))
+
+def _time_at(mins):
+    return _TIMES[mins]
+
+def _new_time(mins):
+    t = object.__new__(Time)
+    object.__setattr__(t, "_mins", mins)
+    return t
+
+# Characters that may follow the minutes in the fast path of _parse() ("" for
+# the end of the string)
+_SUFFIXES = ("", "a", "A", "p", "P", "-")
+
+# The interned Time of every minute of the day, and its str()
+_TIMES = [_new_time(m) for m in xrange(Time.MINS_PER_DAY)]
+_TIME_STRS = [Time.TIME_FSTR.format(m // 60, m % 60) for m in xrange(Time.MINS_PER_DAY)]
+
+# Times of strings that were parsed before, up to _MAX_TEXTS strings
+_BY_TEXT = {}
+_MAX_TEXTS = 10000
+
+# Interned TimeIntervals by (start minutes, end minutes, align)
+_INTERVALS = {}
@@ -1,7 +1,56 @@
+import argparse
+import sys
+
+import crsparser.batch as batch
 import crsparser.cmdui as cmdui
+import crsparser.stats as stats
 
 def main():
-    cmdui.run()
+    ap = argparse.ArgumentParser(
+        description="Parse and filter the UCLA course catalog. Starts the "
+                    "interactive interface unless --batch is given.")
+    ap.add_argument("--batch", metavar="QUERIES",
+                    help="run the filter expressions in this file (one per line, "
+                         "- for stdin) without prompting")
+    ap.add_argument("--depts", default="depts.txt",
+                    help="file with list of departments (default: depts.txt)")
+    ap.add_argument("--data", default="data.txt",
+                    help="file with catalog data (default: data.txt)")
+    ap.add_argument("--out-dir",
+                    help="write the results of each query to a file in this directory "
+                         "instead of stdout")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="always parse the catalog instead of using its snapshot")
+    ap.add_argument("--profile", action="store_true",
+                    help="print the time spent in each stage of parsing and filtering, "
+                         "and other counters, to stderr on exit")
+    args = ap.parse_args()
+
+    if args.profile:
+        stats.enable()
+    try:
+        failed = _run(args)
+    finally:
+        if args.profile:
+            print >> sys.stderr, "\n" + stats.report()
+    sys.exit(1 if failed else 0)
+
+def _run(args):
+    """Runs the interface chosen by args; returns the number of failed queries."""
+    if args.batch is None:
+        cmdui.run()
+        return 0
+
+    if args.batch == "-":
+        queries = sys.stdin
+    else:
+        queries = open(args.batch)
+    try:
+        return batch.run(args.depts, args.data, queries, out_dir=args.out_dir,
+                         use_cache=not args.no_cache)
+    finally:
+        if queries is not sys.stdin:
+            queries.close()
 
 if __name__ == "__main__":
     main()